@@ -0,0 +1,473 @@
+"""
+Scaling benchmark for the prep-to-HTML pipeline on synthetic data
+
+For each scale factor a workspace under --workdir gets a synthetic
+data/clean/usitc_long_aggregated.parquet and data/raw/htsdata.json sized as a
+multiple of the Jan 2024 - Aug 2025 extract. Months, codes and partner
+countries per code each grow by the cube root of the factor, so the row count
+grows with the factor itself. The workspace has a .here marker, the reference
+CSVs and a link to this scripts directory, so the R scripts resolve here() to
+it and never touch the real data/ tree. The stages then run there, in order,
+each as a child process:
+
+    prep         01_prepare_interactive_data.R (PREP_MODE=full)
+    hs_lookup    create_hs_lookup_page.py --hts-json ... --force
+    dashboards   00_master_regenerate_dashboards.R (FORCE_REBUILD=1)
+
+For every stage the harness records wall time, CPU time, the peak RSS of the
+largest single process in the child's tree (wait4's ru_maxrss, which covers
+reaped R workers but never adds them up), the peak summed RSS of the whole
+tree (sampled from /proc, Linux only) and the size of every file the stage
+wrote or rewrote. Records are appended to
+--results as JSON lines tagged with the run time and git commit, so any two
+runs can be compared with --compare. Synthetic inputs are kept in the
+workspace and reused by later runs at the same scale.
+
+Usage:
+    python benchmark_pipeline.py [--scales 1,5,20,50] [--stages prep,hs_lookup,dashboards]
+                                 [--workdir DIR] [--results FILE] [--regenerate]
+    python benchmark_pipeline.py --compare [--results FILE]
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+# Paths (defaults relative to the repository root)
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPT_DIR.parents[1]
+DEFAULT_WORKDIR = REPO_ROOT / "data" / "benchmark"
+DEFAULT_RESULTS = REPO_ROOT / "data_exploration" / "output" / "benchmarks" / "pipeline_benchmarks.jsonl"
+REFERENCE_FILES = ("hs_chapters.csv", "tariff_events_config.csv")
+
+# Shape of the Jan 2024 - Aug 2025 extract at scale 1 (approximate)
+BASE_SHAPE = {"months": 20, "codes": 12000, "partners": 20, "countries": 200}
+FIRST_MONTH = datetime.date(2024, 1, 1)
+TRADED_SHARE = 0.85  # share of code x country pairs with trade in a given month
+GENERATOR_VERSION = 1  # bump when the synthetic data changes, so cached inputs are rebuilt
+
+# Partners named in the dashboards (continent_of() in 07, geo pages), then synthetic ones
+COUNTRIES = [
+    "China", "Mexico", "Canada", "Germany", "Japan", "Vietnam", "Korea, South", "Taiwan", "India", "Ireland",
+    "Italy", "Switzerland", "United Kingdom", "Thailand", "Malaysia", "France", "Netherlands", "Singapore",
+    "Indonesia", "Brazil", "Israel", "Spain", "Belgium", "Sweden", "Philippines", "Bangladesh", "Poland",
+    "Austria", "Denmark", "Finland", "Norway", "Colombia", "Chile", "Peru", "Argentina", "Ecuador",
+    "Costa Rica", "Australia", "New Zealand", "South Africa", "Nigeria", "Egypt", "Kenya", "Morocco",
+    "Saudi Arabia", "United Arab Emirates", "Turkey", "Qatar", "Pakistan",
+]
+
+STAGES = ("prep", "hs_lookup", "dashboards")
+# What each stage's cost is normalised by in the report: trade rows, or htsdata.json lines for the lookup
+STAGE_UNITS = {"prep": "rows", "hs_lookup": "hts_lines", "dashboards": "rows"}
+# Emptied before the stage runs: the lookup build leaves content-hashed files it would write unchanged alone,
+# which would hide them from the output sizes
+STAGE_CLEAN = {"hs_lookup": "data_exploration/output/interactive/data"}
+
+
+def scale_shape(factor):
+    growth = factor ** (1 / 3)
+    shape = {key: max(1, round(value * growth)) for key, value in BASE_SHAPE.items()}
+    shape["countries"] = max(shape["countries"], shape["partners"])
+    return shape
+
+
+# Synthetic inputs
+SYLLABLES = ["al", "ben", "car", "dor", "el", "fin", "gar", "hal", "ion", "jor", "kel", "lin", "mor", "nit",
+             "ol", "pra", "qua", "ros", "sil", "tan", "ur", "ver", "wol", "xen", "yar", "zor"]
+
+
+def word_pool(rng, n=3000):
+    words = set()
+    while len(words) < n:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def phrase(rng, words, k):
+    return " ".join(rng.choice(words) for _ in range(k)).capitalize()
+
+
+def read_chapter_numbers(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [int(row["chapter_number"]) for row in csv.DictReader(f)]
+
+
+def synthetic_codes(n_codes, chapters):
+    """n_codes distinct 10-digit codes spread evenly over the chapters, sorted.
+
+    The j-th code of a chapter gets heading j // 400, subheading (j // 40) % 10,
+    8-digit line (j // 4) % 10 and statistical suffix j % 4, so the tree is
+    always four levels deep with real fan-out at every level.
+    """
+    codes = []
+    for i in range(n_codes):
+        chapter, j = chapters[i % len(chapters)], i // len(chapters)
+        codes.append(f"{chapter:02d}{1 + j // 400:02d}{10 * ((j // 40) % 10):02d}{10 * ((j // 4) % 10):02d}{10 * (j % 4) + 10:02d}")
+    return sorted(codes)
+
+
+def write_hts_json(path, codes, rng, words):
+    """htsdata.json with a heading, subheading and 8-digit line above every group of codes."""
+    rates = ["Free", "2.5%", "3.7%", "5%", "6.5%", "10%", "25%", "1.2¢/kg", "4.4¢/kg + 3%"]
+    units = [["No."], ["kg"], ["doz."], ["m²"], ["liters"], ["No.", "kg"]]
+
+    def line(htsno, indent, description, general=""):
+        return {"htsno": htsno, "indent": str(indent), "description": description, "superior": None,
+                "units": rng.choice(units) if len(htsno) > 10 else [], "general": general,
+                "special": "Free (A,AU,BH,CL,CO,D,E,IL,JO,KR,MA,OM,P,PA,PE,S,SG)" if general else "",
+                "other": rng.choice(rates) if general else "", "footnotes": [], "quotaQuantity": "", "additionalDuties": ""}
+
+    count, previous = 0, ""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for code in codes:
+            lines = []
+            if code[:4] != previous[:4]:
+                lines.append(line(code[:4], 0, phrase(rng, words, 4) + ":"))
+            if code[:6] != previous[:6]:
+                lines.append(line(f"{code[:4]}.{code[4:6]}", 1, phrase(rng, words, 3) + ":"))
+            if code[:8] != previous[:8]:
+                lines.append(line(f"{code[:4]}.{code[4:6]}.{code[6:8]}", 2, phrase(rng, words, 3), rng.choice(rates)))
+            lines.append(line(f"{code[:4]}.{code[4:6]}.{code[6:8]}.{code[8:]}", 3, phrase(rng, words, rng.randint(1, 5))))
+            for item in lines:
+                f.write(("," if count else "") + json.dumps(item, ensure_ascii=False))
+                count += 1
+            previous = code
+        f.write("]")
+    return count
+
+
+def write_usitc(path, codes, shape, seed, words):
+    """usitc_long_aggregated.parquet, one row group per month.
+
+    Every code trades with a fixed set of partners, drawn with larger
+    countries more likely; each month a pair has trade with probability
+    TRADED_SHARE, a lognormal value around the pair's own level and a rate
+    around the code's base rate.
+    """
+    rng = np.random.default_rng(seed)
+    text_rng = random.Random(seed)
+    n_codes, n_countries, k = len(codes), shape["countries"], shape["partners"]
+    countries = COUNTRIES[:n_countries] + [f"Country {i:04d}" for i in range(len(COUNTRIES), n_countries)]
+
+    # Weighted sampling without replacement (largest keys of u ** (1 / weight))
+    weight = 1 / np.arange(1, n_countries + 1) ** 0.8
+    keys = rng.random((n_codes, n_countries), dtype=np.float32) ** (1 / weight).astype(np.float32)
+    partner = np.argpartition(-keys, k - 1, axis=1)[:, :k].ravel()
+    del keys
+    code_of = np.repeat(np.arange(n_codes), k)
+
+    pair_level = rng.normal(11, 2, n_codes)[code_of] + np.log(weight[partner] * n_countries) + rng.normal(0, 1, len(partner))
+    code_rate = np.where(rng.random(n_codes) < 0.35, 0, rng.gamma(2, 0.03, n_codes))
+    country_extra = np.where(np.arange(n_countries) == 0, 0.2, rng.gamma(1, 0.01, n_countries))
+    distance = rng.uniform(500, 20000, n_countries)
+
+    hts_number = pa.array([f"{c[:4]}.{c[4:6]}.{c[6:8]}.{c[8:]}" for c in codes])
+    description = pa.array([phrase(text_rng, words, 4) for _ in codes])
+    chapter = pa.array(np.array([int(c[:2]) for c in codes], dtype=np.int32))
+    country_names = pa.array(countries)
+
+    rows, writer = 0, None
+    try:
+        for m in range(shape["months"]):
+            month = datetime.date(FIRST_MONTH.year + (FIRST_MONTH.month - 1 + m) // 12, (FIRST_MONTH.month - 1 + m) % 12 + 1, 1)
+            live = np.flatnonzero(rng.random(len(partner)) < TRADED_SHARE)
+            c, p, n = code_of[live], partner[live], len(live)
+            value = np.round(np.exp(pair_level[live] + rng.normal(0, 0.5, n)))
+            rate = np.clip(code_rate[c] + country_extra[p] * (m >= 12) + rng.normal(0, 0.005, n), 0, None)
+            dutiable = value * (rate > 0)
+            share_61 = (p == 0) * rng.uniform(0, 1, n)
+            share_69 = (rng.random(n) < 0.05) * rng.uniform(0, 1, n)
+            freight = value * rng.uniform(0.01, 0.08, n)
+            columns = {
+                "Country": pc.take(country_names, pa.array(p)),
+                "HTS Number": pc.take(hts_number, pa.array(c)),
+                "date": pa.array(np.full(n, np.datetime64(month, "D"))),
+                "Description": pc.take(description, pa.array(c)),
+                "chapter": pc.take(chapter, pa.array(c)),
+                "value_total": value, "duties_total": np.round(value * rate),
+                "cif_value_total": value + freight, "freight_ins_total": freight,
+                "quantity_total": np.round(value / rng.uniform(1, 500, n)),
+                "value_dutiable": dutiable, "duties_dutiable": np.round(dutiable * rate),
+                "value_61": np.round(value * share_61), "duties_61": np.round(value * share_61 * 0.25),
+                "value_69": np.round(value * share_69), "duties_69": np.round(value * share_69 * 0.25),
+                "rate_total": rate, "rate_dutiable": np.where(rate > 0, rate, np.nan),
+                "rate_61": np.where(share_61 > 0, 0.25, np.nan), "rate_69": np.where(share_69 > 0, 0.25, np.nan),
+                "seadistance": distance[p],
+            }
+            table = pa.table({name: pa.array(col) if isinstance(col, np.ndarray) else col for name, col in columns.items()})
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            rows += n
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def prepare_workspace(ws, factor, seed, regenerate):
+    """Lay out the workspace for one scale; (re)generate its inputs unless cached ones match."""
+    for sub in ("data/raw", "data/clean", "data/processed", "data_exploration/output/interactive"):
+        (ws / sub).mkdir(parents=True, exist_ok=True)
+    (ws / ".here").touch()
+    for name in REFERENCE_FILES:
+        shutil.copy2(REPO_ROOT / "data" / name, ws / "data" / name)
+    scripts = ws / "data_exploration" / "scripts"
+    if not scripts.exists():
+        try:
+            scripts.symlink_to(SCRIPT_DIR, target_is_directory=True)
+        except OSError:  # no symlink rights (Windows without developer mode)
+            shutil.copytree(SCRIPT_DIR, scripts, ignore=shutil.ignore_patterns("__pycache__"))
+
+    shape = scale_shape(factor)
+    spec_path = ws / "data" / "benchmark_inputs.json"
+    spec = {"version": GENERATOR_VERSION, "scale": factor, "seed": seed, **shape}
+    cached = json.loads(spec_path.read_text(encoding="utf-8")) if spec_path.exists() else {}
+    if not regenerate and {key: cached.get(key) for key in spec} == spec:
+        return cached, None
+
+    rng = random.Random(seed)
+    words = word_pool(rng)
+    codes = synthetic_codes(shape["codes"], read_chapter_numbers(REPO_ROOT / "data" / "hs_chapters.csv"))
+    start = time.perf_counter()
+    spec["hts_lines"] = write_hts_json(ws / "data" / "raw" / "htsdata.json", codes, rng, words)
+    spec["rows"] = write_usitc(ws / "data" / "clean" / "usitc_long_aggregated.parquet", codes, shape, seed, words)
+    elapsed = time.perf_counter() - start
+    spec_path.write_text(json.dumps(spec, indent=1), encoding="utf-8")
+    return spec, elapsed
+
+
+# Stages
+def stage_command(stage, ws):
+    """argv and extra environment of a stage, or None when its runtime is missing."""
+    if stage == "hs_lookup":
+        interactive = ws / "data_exploration" / "output" / "interactive"
+        processed = ws / "data" / "processed"
+        return [sys.executable, str(SCRIPT_DIR / "create_hs_lookup_page.py"),
+                "--hts-json", str(ws / "data" / "raw" / "htsdata.json"), "--chapters", str(ws / "data" / "hs_chapters.csv"),
+                "--input", str(processed / "hs10_lookup.parquet"), "--monthly", str(processed / "monthly_by_hs10.parquet"),
+                "--output", str(interactive), "--force"], {}
+    rscript = shutil.which("Rscript")
+    if rscript is None:
+        return None
+    if stage == "prep":
+        return [rscript, str(SCRIPT_DIR / "01_prepare_interactive_data.R")], {"PREP_MODE": "full"}
+    return [rscript, str(SCRIPT_DIR / "00_master_regenerate_dashboards.R")], {"FORCE_REBUILD": "1"}
+
+
+def snapshot(ws):
+    """(size, mtime) of every file in the workspace, not following the scripts link."""
+    files = {}
+    for root, dirs, names in os.walk(ws):
+        dirs[:] = [d for d in dirs if not os.path.islink(os.path.join(root, d))]
+        for name in names:
+            path = os.path.join(root, name)
+            st = os.stat(path)
+            files[Path(path).relative_to(ws).as_posix()] = (st.st_size, st.st_mtime_ns)
+    return files
+
+
+def tree_rss_kb(pid):
+    """Summed VmRSS in KB of pid and all its descendants (processes that exit mid-walk are skipped)."""
+    total, stack = 0, [pid]
+    while stack:
+        p = stack.pop()
+        try:
+            with open(f"/proc/{p}/status", encoding="utf-8") as f:
+                total += next((int(line.split()[1]) for line in f if line.startswith("VmRSS:")), 0)
+            for task in os.listdir(f"/proc/{p}/task"):
+                with open(f"/proc/{p}/task/{task}/children", encoding="utf-8") as f:
+                    stack += [int(c) for c in f.read().split()]
+        except (FileNotFoundError, ProcessLookupError):
+            pass
+    return total
+
+
+def run_stage(argv, env, ws, log_path, interval=0.2):
+    """Run one stage to completion; wall and CPU seconds, peak RSS in MB of the largest single process
+    (None without wait4) and of the whole process tree (None off Linux) and exit code."""
+    with open(log_path, "w", encoding="utf-8") as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen(argv, cwd=ws, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT)
+        if hasattr(os, "wait4"):
+            # The children lists need a Linux kernel with CONFIG_PROC_CHILDREN
+            tree_kb = tree_rss_kb(proc.pid) if os.path.exists(f"/proc/{proc.pid}/task/{proc.pid}/children") else None
+            while True:
+                done, status, usage = os.wait4(proc.pid, os.WNOHANG)
+                if done:
+                    break
+                if tree_kb is not None:
+                    tree_kb = max(tree_kb, tree_rss_kb(proc.pid))
+                time.sleep(interval)
+            wall = time.perf_counter() - start
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is in KB on Linux and in bytes on macOS
+            rss_mb = usage.ru_maxrss / (1024 ** 2 if sys.platform == "darwin" else 1024)
+            tree_mb = None if tree_kb is None else round(tree_kb / 1024, 1)
+            return wall, usage.ru_utime + usage.ru_stime, round(rss_mb, 1), tree_mb, proc.returncode
+        proc.wait()
+        return time.perf_counter() - start, None, None, None, proc.returncode
+
+
+def export_lookup_csv(ws):
+    """hs10_lookup.csv for the dashboards, which read it next to the parquet (not part of any timed stage)."""
+    processed = ws / "data" / "processed"
+    pacsv.write_csv(pq.read_table(processed / "hs10_lookup.parquet"), processed / "hs10_lookup.csv")
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return out.stdout.strip() + ("+dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# Reporting
+def fmt_bytes(n):
+    return "--" if n is None else f"{n / 1024 ** 2:,.1f} MB"
+
+
+def fmt_seconds(s):
+    return "--" if s is None else f"{s:,.1f}s"
+
+
+def fmt_mb(v):
+    return "--" if v is None else f"{v:,.0f} MB"
+
+
+def print_table(header, rows):
+    widths = [max(len(str(x)) for x in col) for col in zip(header, *rows)]
+    for row in [header, ["-" * w for w in widths], *rows]:
+        print("  ".join(str(x).rjust(w) for x, w in zip(row, widths)))
+
+
+def print_run(records):
+    """Per stage and scale; µs per input row (or htsdata.json line) against the smallest scale shows where growth stops being linear."""
+    base = {r["stage"]: r for r in records if r["scale"] == min(x["scale"] for x in records) and r["status"] == "ok"}
+    rows = []
+    for r in records:
+        unit = STAGE_UNITS[r["stage"]]
+        per_row = r["wall_s"] / r[unit] * 1e6 if r["status"] == "ok" else None
+        b = base.get(r["stage"])
+        vs_base = per_row / (b["wall_s"] / b[unit] * 1e6) if per_row and b else None
+        rows.append([r["stage"], f"{r['scale']}x", f"{r['rows']:,}", r["status"], fmt_seconds(r.get("wall_s")),
+                     fmt_seconds(r.get("cpu_s")), fmt_mb(r.get("peak_rss_mb")), fmt_mb(r.get("tree_rss_mb")),
+                     fmt_bytes(r.get("output_bytes")), "--" if per_row is None else f"{per_row:.2f}",
+                     "--" if vs_base is None else f"{vs_base:.2f}x"])
+    print_table(["stage", "scale", "rows", "status", "wall", "cpu", "max proc rss", "tree rss", "output", "µs/unit", "vs base"], rows)
+
+
+def compare_runs(results_path, threshold=1.2):
+    """Latest run against the one before it, per stage and scale; flags anything over threshold x."""
+    runs = defaultdict(list)
+    with open(results_path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            runs[record["run"]].append(record)
+    if len(runs) < 2:
+        print(f"Need two runs in {results_path} to compare, found {len(runs)}")
+        return 1
+    before_run, after_run = sorted(runs)[-2:]
+    before = {(r["stage"], r["scale"]): r for r in runs[before_run]}
+    print(f"{after_run} ({runs[after_run][0]['commit']}) vs {before_run} ({runs[before_run][0]['commit']})\n")
+
+    rows, flagged = [], 0
+    for r in runs[after_run]:
+        old = before.get((r["stage"], r["scale"]))
+        if r["status"] != "ok" or not old or old["status"] != "ok":
+            rows.append([r["stage"], f"{r['scale']}x", *["--"] * 8, r["status"]])
+            continue
+        cells, worst = [], 0
+        for key, fmt in (("wall_s", fmt_seconds), ("peak_rss_mb", fmt_mb), ("tree_rss_mb", fmt_mb), ("output_bytes", fmt_bytes)):
+            ratio = r[key] / old[key] if r.get(key) and old.get(key) else None
+            worst = max(worst, ratio or 0)
+            cells += [f"{fmt(old.get(key))} -> {fmt(r.get(key))}", "--" if ratio is None else f"{ratio:.2f}x"]
+        flagged += worst > threshold
+        rows.append([r["stage"], f"{r['scale']}x", *cells, "REGRESSION" if worst > threshold else "ok"])
+    print_table(["stage", "scale", "wall", "", "max proc rss", "", "tree rss", "", "output", "", ""], rows)
+    print(f"\n{flagged} stage(s) over {threshold}x on wall time, peak RSS or output size")
+    return 1 if flagged else 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic data at several scales.")
+    parser.add_argument("--scales", default="1,5,20,50", help="comma-separated multiples of the current extract")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated subset of {','.join(STAGES)}")
+    parser.add_argument("--workdir", type=Path, default=DEFAULT_WORKDIR, help="where the per-scale workspaces live")
+    parser.add_argument("--results", type=Path, default=DEFAULT_RESULTS, help="JSON-lines file the results are appended to")
+    parser.add_argument("--seed", type=int, default=2024, help="seed of the synthetic data")
+    parser.add_argument("--regenerate", action="store_true", help="rebuild the synthetic inputs even if cached ones match")
+    parser.add_argument("--compare", action="store_true", help="compare the last two runs in --results and exit")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.compare:
+        return compare_runs(args.results)
+
+    scales = [float(s) if "." in s else int(s) for s in args.scales.split(",")]
+    stages = [s for s in STAGES if s in args.stages.split(",")]
+    run, commit = datetime.datetime.now().isoformat(timespec="seconds"), git_commit()
+    args.results.parent.mkdir(parents=True, exist_ok=True)
+    records = []
+
+    for factor in scales:
+        ws = args.workdir / f"x{factor}"
+        spec, gen_seconds = prepare_workspace(ws, factor, args.seed, args.regenerate)
+        if gen_seconds is None:
+            print(f"\n{factor}x: reusing synthetic inputs in {ws} ({spec['rows']:,} rows)")
+        else:
+            print(f"\n{factor}x: generated {spec['rows']:,} rows, {spec['codes']:,} codes, {spec['months']} months, "
+                  f"{spec['countries']} countries in {gen_seconds:.1f}s at: {ws}")
+
+        for stage in stages:
+            command = stage_command(stage, ws)
+            record = {"run": run, "commit": commit, "scale": factor, "stage": stage,
+                      **{key: spec[key] for key in ("rows", "codes", "months", "countries", "hts_lines")}}
+            if command is None:
+                record["status"] = "skipped: Rscript not found"
+            else:
+                if stage in STAGE_CLEAN:
+                    shutil.rmtree(ws / STAGE_CLEAN[stage], ignore_errors=True)
+                before = snapshot(ws)
+                wall, cpu, rss, tree_rss, code = run_stage(*command, ws, ws / f"{stage}.log")
+                after = snapshot(ws)
+                outputs = {name: size for name, (size, mtime) in after.items()
+                           if before.get(name) != (size, mtime) and not name.endswith(".log")}
+                record.update(status="ok" if code == 0 else f"failed: exit {code}, see {stage}.log",
+                              wall_s=round(wall, 3), cpu_s=None if cpu is None else round(cpu, 3), peak_rss_mb=rss,
+                              tree_rss_mb=tree_rss, output_bytes=sum(outputs.values()), outputs=outputs)
+                if stage == "hs_lookup" and code == 0:
+                    export_lookup_csv(ws)
+            print(f"  {stage}: {record['status']}" + (f" in {record['wall_s']:.1f}s" if "wall_s" in record else ""))
+            records.append(record)
+            with open(args.results, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+    print()
+    print_run(records)
+    print(f"\nAppended {len(records)} records to: {args.results}")
+    return 0 if all(r["status"] == "ok" or r["status"].startswith("skipped") for r in records) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,484 @@
 """
-Create the HS Code Lookup HTML page and copy JSON data
+Create the HS Code Lookup HTML page, its search worker, chapter data shards and search index
+
+Data assets are written under content-hashed names (hs10/ch01.<hash>.json) so
+they can be cached indefinitely; only the HTML page keeps a fixed name. The
+hashes of the inputs are recorded in data/hs10_build.json and a rerun with the
+same inputs exits without touching the output tree. With PIPELINE_TRACE set,
+each build step is recorded as a span (see pipeline_trace.py).
+
+With --hts-json the lookup table itself is rebuilt first: htsdata.json is
+streamed once, breadcrumbs come from an indent stack, and hs10_lookup.parquet
+and hs10_lookup.json are written to the --input location. Chapter and section
+titles are not in htsdata.json and come from data/hs_chapters.csv.
+
+When data/processed/monthly_by_hs10.parquet exists, each code's monthly trade
+value and effective tariff rate are packed into data/hs10_series.<hash>.f32
+(one fixed-size float32 row per code, located through hs10_series.<hash>.json).
+The detail panel fetches just the opened code's row with an HTTP Range request
+and draws it as sparklines; SeriesStore reads the same file memory-mapped.
+
+Usage:
+    python create_hs_lookup_page.py [--input PARQUET] [--output DIR] [--force] [--monthly PARQUET]
+                                    [--hts-json data/raw/htsdata.json [--compare-r]]
 """
+import argparse
+import csv
+import gzip
+import hashlib
+import json
+import math
+import mmap
+import os
+import re
 import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+from collections import defaultdict
 from pathlib import Path
 
-# Paths
-OUTPUT_DIR = Path(r"C:\Code\trade_updated\data_exploration\output\interactive")
-DATA_DIR = OUTPUT_DIR / "data"
-DATA_DIR.mkdir(exist_ok=True)
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pipeline_trace import span
+
+# Paths (defaults relative to the repository root)
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPT_DIR.parents[1]
+DEFAULT_CHAPTERS = REPO_ROOT / "data" / "hs_chapters.csv"
+DEFAULT_INPUT = REPO_ROOT / "data" / "processed" / "hs10_lookup.parquet"
+DEFAULT_MONTHLY = REPO_ROOT / "data" / "processed" / "monthly_by_hs10.parquet"
+DEFAULT_OUTPUT = REPO_ROOT / "data_exploration" / "output" / "interactive"
+BUILD_RECORD = "hs10_build.json"
+
+# Search index
+# Tokens must match tokenize() in the page script: lower-cased ASCII alphanumerics
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+TEXT_FIELDS = ("description_short", "description_raw")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or "").lower())
+
+
+def delta_encode(ids):
+    """Store a sorted posting list as gaps so small ids dominate the JSON."""
+    gaps, prev = [], 0
+    for i in ids:
+        gaps.append(i - prev)
+        prev = i
+    return gaps
+
+
+def build_search_index(hs_data):
+    """Inverted index over the searchable text fields, keyed by record ordinal.
+
+    Ordinals follow sorted HS10 codes, so any code prefix is a contiguous
+    ordinal range (found by binary search over `codes`) and every chapter is a
+    single [start, end) slice. Chapter names are indexed once per chapter
+    rather than once per record.
+    """
+    codes = sorted(hs_data)
+    postings = defaultdict(list)
+    chapter_postings = defaultdict(list)
+    chapters = []
+    for ordinal, code in enumerate(codes):
+        item = hs_data[code]
+        terms = set()
+        for field in TEXT_FIELDS:
+            terms.update(tokenize(item.get(field)))
+        for term in terms:
+            postings[term].append(ordinal)
+
+        if not chapters or chapters[-1][0] != item["chapter_number"]:
+            for term in set(tokenize(item.get("chapter_name"))):
+                chapter_postings[term].append(len(chapters))
+            chapters.append([item["chapter_number"], ordinal, ordinal + 1])
+        else:
+            chapters[-1][2] = ordinal + 1
+
+    terms = sorted(postings)
+    chapter_terms = sorted(chapter_postings)
+    return {
+        "codes": codes,
+        "terms": terms,
+        "postings": [delta_encode(postings[t]) for t in terms],
+        "chapters": chapters,
+        "chapter_terms": chapter_terms,
+        "chapter_postings": [chapter_postings[t] for t in chapter_terms],
+    }
+
+
+class StringTable:
+    """Distinct strings in first-seen order; records store their position."""
+
+    def __init__(self):
+        self.strings = []
+        self._ids = {}
+
+    def id(self, value):
+        value = value or ""
+        if value not in self._ids:
+            self._ids[value] = len(self.strings)
+            self.strings.append(value)
+        return self._ids[value]
+
+
+def encode_shard(rows, dictionary):
+    """Columnar chapter shard, decoded by decodeShard() in the page script.
+
+    Breadcrumb segments and raw descriptions repeat heavily within a chapter,
+    so they share a shard-local string table; units and rate strings repeat
+    across chapters and go to the global `dictionary` tables. Fields derivable
+    from the code (formatted code, HS2-HS8) or from the manifest (section and
+    chapter names) are not shipped.
+    """
+    local = StringTable()
+    crumb_lengths, crumbs = [], []
+    for row in rows:
+        parts = row["description_long"].split(" > ")
+        crumb_lengths.append(len(parts))
+        crumbs.extend(local.id(part) for part in parts)
+    return {
+        "hts10": [row["hts10"] for row in rows],
+        "short": [row["description_short"] for row in rows],
+        "raw": [local.id(row["description_raw"]) for row in rows],
+        "crumb_lengths": crumb_lengths,
+        "crumbs": crumbs,
+        "strings": local.strings,
+        "units": [dictionary["units"].id(row["units"]) for row in rows],
+        "general": [dictionary["rates"].id(row["general_rate"]) for row in rows],
+        "special": [dictionary["rates"].id(row["special_rate"]) for row in rows],
+        "other": [dictionary["rates"].id(row["other_rate"]) for row in rows],
+    }
+
+
+def build_manifest(hs_data, search_index):
+    """Section/chapter tree with counts plus one columnar shard per chapter.
+
+    Each chapter's shard holds its records in ordinal order, so record
+    `start + i` of the search index is row `i` of the chapter's shard.
+    """
+    sections, shards = [], {}
+    dictionary = {"units": StringTable(), "rates": StringTable()}
+    for chapter_number, start, end in search_index["chapters"]:
+        rows = [hs_data[code] for code in search_index["codes"][start:end]]
+        first = rows[0]
+        if not sections or sections[-1]["number"] != first["section_number"]:
+            sections.append({"number": first["section_number"], "name": first["section_name"], "chapters": []})
+        shard = f"hs10/ch{chapter_number:02d}.json"
+        sections[-1]["chapters"].append({
+            "number": chapter_number,
+            "name": first["chapter_name"],
+            "start": start,
+            "count": end - start,
+            "shard": shard,
+        })
+        # Later chapters of some sections carry an abbreviated section name
+        if first["section_name"] != sections[-1]["name"]:
+            sections[-1]["chapters"][-1]["section_name"] = first["section_name"]
+        shards[shard] = encode_shard(rows, dictionary)
+    manifest = {
+        "total": len(search_index["codes"]),
+        "index": "hs10_index.json",
+        "dictionary": "hs10_dictionary.json",
+        "sections": sections,
+    }
+    return manifest, {name: table.strings for name, table in dictionary.items()}, shards
+
+
+def dump_json(payload):
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def write_json(path, payload):
+    data = dump_json(payload)
+    path.write_bytes(data)
+    return data
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(name, data):
+    """hs10/ch01.json -> hs10/ch01.<first 10 hex of sha256>.json"""
+    stem, dot, ext = name.rpartition(".")
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{dot}{ext}"
+
+
+class AssetWriter:
+    """Writes content-addressed files under a root and remembers what it wrote.
+
+    A fingerprinted file that already exists has the same content by
+    construction, so it is left alone and keeps its mtime.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.outputs = []
+        self.written = 0
+
+    def put(self, name, data, hashed=True):
+        if hashed:
+            name = fingerprint(name, data)
+        path = self.root / name
+        if not path.exists() or (not hashed and path.read_bytes() != data):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            self.written += 1
+        self.outputs.append(name)
+        return name
+
+
+def kb(*files):
+    """Raw and gzipped size of one or more written files, as a label."""
+    raw = sum(len(data) for data in files)
+    packed = sum(len(gzip.compress(data)) for data in files)
+    return f"{raw / 1024:,.0f} KB, {packed / 1024:,.0f} KB gzipped"
+
+
+# Per-code trade history (monthly_by_hs10.parquet -> hs10_series.<hash>.f32)
+SERIES_METRICS = ("trade_value", "tariff_rate")
+
+
+def build_series(monthly_parquet):
+    """Packed month series of every traded code, as (index, matrix bytes).
+
+    The matrix is little-endian float32 with one fixed-size row per code, in
+    index["codes"] order: each metric of SERIES_METRICS over index["months"],
+    NaN where the code had no trade that month. A code's history is therefore
+    the single byte range [row * row_bytes, (row + 1) * row_bytes).
+    """
+    table = pq.read_table(monthly_parquet, columns=["HTS_Number", "date", *SERIES_METRICS]).to_pydict()
+    months = sorted({d.strftime("%Y-%m") for d in table["date"]})
+    codes = sorted(set(table["HTS_Number"]))
+    month_col = {m: j for j, m in enumerate(months)}
+    code_row = {c: i for i, c in enumerate(codes)}
+    n_months, width = len(months), len(SERIES_METRICS) * len(months)
+
+    matrix = array("f", [math.nan]) * (len(codes) * width)
+    for k, metric in enumerate(SERIES_METRICS):
+        for code, d, value in zip(table["HTS_Number"], table["date"], table[metric]):
+            if value is not None:
+                matrix[code_row[code] * width + k * n_months + month_col[d.strftime("%Y-%m")]] = value
+    if sys.byteorder != "little":
+        matrix.byteswap()
+
+    index = {"metrics": list(SERIES_METRICS), "months": months, "row_bytes": width * matrix.itemsize, "codes": codes}
+    return index, matrix.tobytes()
+
+
+class SeriesStore:
+    """Read access to a built hs10_series store without loading the matrix.
+
+    The .f32 file is memory-mapped and each lookup unpacks one row, so
+    reading a code's history costs the same on a full build as on a sample.
+
+        store = SeriesStore.from_output(DEFAULT_OUTPUT)
+        store["8471300100"]["trade_value"]  # one value per store.months, NaN = no trade
+    """
+
+    def __init__(self, index_path):
+        index_path = Path(index_path)
+        self.index = json.loads(index_path.read_text(encoding="utf-8"))
+        self.months = self.index["months"]
+        self.rows = {code: i for i, code in enumerate(self.index["codes"])}
+        with open(index_path.parent / self.index["file"], "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.rows else b""
+
+    @classmethod
+    def from_output(cls, output_dir):
+        """The store of the last build into output_dir, found through its build record."""
+        record = json.loads((Path(output_dir) / "data" / BUILD_RECORD).read_text(encoding="utf-8"))
+        if not record.get("series"):
+            raise FileNotFoundError(f"The last build into {output_dir} had no monthly_by_hs10 input, so wrote no series")
+        return cls(Path(output_dir) / "data" / record["series"])
+
+    def __contains__(self, hts10):
+        return hts10 in self.rows
+
+    def __getitem__(self, hts10):
+        n = len(self.months)
+        values = struct.unpack_from(f"<{n * len(self.index['metrics'])}f", self.map, self.rows[hts10] * self.index["row_bytes"])
+        return {metric: list(values[k * n:(k + 1) * n]) for k, metric in enumerate(self.index["metrics"])}
+
+
+# HTS source parsing (htsdata.json -> hs10_lookup.parquet/.json)
+LOOKUP_SCHEMA = pa.schema([(name, pa.int64() if name == "chapter_number" else pa.string()) for name in (
+    "hts10", "hts10_formatted", "hs2", "hs4", "hs6", "hs8", "description_long", "description_short",
+    "description_raw", "chapter_number", "chapter_name", "section_number", "section_name", "units",
+    "general_rate", "special_rate", "other_rate", "footnotes", "quota_quantity", "additional_duties",
+    "hs4_description", "hs6_description",
+)])
+LOOKUP_BATCH_ROWS = 5000
+
+
+def iter_json_array(path, chunk_size=1 << 16):
+    """Yield the elements of a top-level JSON array one at a time.
+
+    Only the current chunk and the element being decoded are held in memory,
+    so htsdata.json is never parsed as a whole.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8-sig") as f:
+        buf, eof = "", False
+        while not buf.strip() and not eof:
+            more = f.read(chunk_size)
+            buf, eof = buf + more, not more
+        buf = buf.lstrip()
+        if not buf.startswith("["):
+            raise ValueError(f"{path} is not a JSON array")
+        buf = buf[1:]
+        while True:
+            buf = buf.lstrip()
+            if buf.startswith(","):
+                buf = buf[1:].lstrip()
+            if buf.startswith("]"):
+                return
+            try:
+                item, end = decoder.raw_decode(buf)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                more = f.read(chunk_size)
+                buf, eof = buf + more, not more
+                continue
+            yield item
+            buf = buf[end:]
+
+
+def read_chapters(path):
+    """chapter_number -> (chapter_name, section_number, section_name); htsdata.json has no chapter or section titles."""
+    with open(path, newline="", encoding="utf-8") as f:
+        return {int(row["chapter_number"]): (row["chapter_name"], row["section_number"], row["section_name"])
+                for row in csv.DictReader(f)}
+
+
+def is_other(text):
+    return text.rstrip(":").strip().lower() == "other"
+
+
+def short_label(ancestors, raw):
+    """Nearest ancestor that is not a bare "Other", qualified by the line's own text."""
+    parent = next((a for a in reversed(ancestors) if not is_other(a)), "")
+    if not parent:
+        return raw
+    return parent if is_other(raw) else f"{parent}: {raw}"
+
+
+def iter_lookup_rows(hts_json, chapters):
+    """One HS10 row per 10-digit line of htsdata.json, in a single pass.
+
+    `stack[k]` is the latest description at indent k; a line at indent k
+    replaces everything from k down, so memory is bounded by tree depth.
+    Lines with an empty description leave the stack alone, as in step 1 of
+    01_prepare_interactive_data.R.
+
+    Headings precede their HS10 lines, so each row also gets the text of the
+    line numbered with its HS4 and HS6 code. An HS6 that has no line of its
+    own (one 8-digit subdivision, "0101.21.00") takes that line's text. A
+    bare "Other" heading is qualified by its nearest named ancestor.
+    """
+    stack, headings = [], {}
+    for line in iter_json_array(hts_json):
+        desc = (line.get("description") or "").strip().rstrip(":").strip()
+        if not desc:
+            continue
+        indent = int(line.get("indent") or 0)
+        del stack[indent:]
+        stack.append(desc)
+        code = re.sub(r"[. ]", "", line.get("htsno") or "")
+        if len(code) in (4, 6, 8):
+            heading = desc
+            if is_other(desc):
+                parent = next((a for a in reversed(stack[:-1]) if not is_other(a)), "")
+                heading = f"{parent}: {desc}" if parent else desc
+            headings.setdefault(code, heading)
+            if len(code) == 8:
+                headings.setdefault(code[:6] + "*", heading)  # first 8-digit line under the HS6
+        if len(code) != 10:
+            continue
+        chapter_name, section_number, section_name = chapters.get(int(code[:2]), ("", "", ""))
+        yield {
+            "hts10": code,
+            "hts10_formatted": f"{code[:4]}.{code[4:6]}.{code[6:8]}.{code[8:]}",
+            "hs2": code[:2], "hs4": code[:4], "hs6": code[:6], "hs8": code[:8],
+            "description_long": " > ".join([f"{section_number}: {section_name}",
+                                            f"Chapter {int(code[:2])}: {chapter_name}", *stack]),
+            "description_short": short_label(stack[:-1], desc),
+            "description_raw": desc,
+            "chapter_number": int(code[:2]),
+            "chapter_name": chapter_name,
+            "section_number": section_number,
+            "section_name": section_name,
+            "units": ", ".join(line.get("units") or []),
+            "general_rate": line.get("general") or "",
+            "special_rate": line.get("special") or "",
+            "other_rate": line.get("other") or "",
+            "footnotes": " | ".join(note.get("value", "") for note in line.get("footnotes") or []),
+            "quota_quantity": line.get("quotaQuantity") or "",
+            "additional_duties": line.get("additionalDuties") or "",
+            "hs4_description": headings.get(code[:4], ""),
+            "hs6_description": headings.get(code[:6]) or headings.get(code[:6] + "00") or headings.get(code[:6] + "*", ""),
+        }
 
-# Copy JSON lookup to data folder
-src_json = Path(r"C:\Code\trade_updated\data\processed\hs10_lookup.json")
-dst_json = DATA_DIR / "hs10_lookup.json"
-shutil.copy(src_json, dst_json)
-print(f"Copied JSON to: {dst_json}")
 
-# Create the HTML file
-html_content = '''<!DOCTYPE html>
+def build_lookup(hts_json, chapters_csv, out_parquet):
+    """Stream htsdata.json into hs10_lookup.parquet and hs10_lookup.json, a batch at a time."""
+    chapters = read_chapters(chapters_csv)
+    out_parquet.parent.mkdir(parents=True, exist_ok=True)
+    out_json = out_parquet.with_suffix(".json")
+    count, batch = 0, []
+    with pq.ParquetWriter(out_parquet, LOOKUP_SCHEMA) as writer, open(out_json, "w", encoding="utf-8") as js:
+        js.write("{")
+        for row in iter_lookup_rows(hts_json, chapters):
+            js.write(("," if count else "") + json.dumps(row["hts10"]) + ":" + json.dumps(row, ensure_ascii=False))
+            batch.append(row)
+            count += 1
+            if len(batch) == LOOKUP_BATCH_ROWS:
+                writer.write_table(pa.Table.from_pylist(batch, schema=LOOKUP_SCHEMA))
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=LOOKUP_SCHEMA))
+        js.write("}")
+    return count
+
+
+def time_r_step1(hts_json):
+    """Run step 1 of 01_prepare_interactive_data.R on the same file and return its wall time.
+
+    The block is cut out of the R script between its step 1 and step 2
+    headers; its hs_lookup.parquet goes to a temporary file.
+    """
+    rscript = shutil.which("Rscript")
+    if rscript is None:
+        return None
+    source = (SCRIPT_DIR / "01_prepare_interactive_data.R").read_text(encoding="utf-8")
+    block = source[source.index('message("Step 1'):source.index("# 2. CREATE TRUMP")]
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp) / "hs_lookup.parquet"
+        block = (block.replace('here("data", "raw", "htsdata.json")', json.dumps(Path(hts_json).resolve().as_posix()))
+                 .replace('here("data", "processed", "hs_lookup.parquet")', json.dumps(out.as_posix())))
+        script = Path(tmp) / "step1.R"
+        trace_r = json.dumps((SCRIPT_DIR / "pipeline_trace.R").as_posix())
+        script.write_text(f"pacman::p_load(arrow, data.table, jsonlite, here)\nsource({trace_r})\n" + block, encoding="utf-8")
+        env = {k: v for k, v in os.environ.items() if k != "PIPELINE_TRACE"}  # step 1's spans are not this trace's
+        start = time.perf_counter()
+        subprocess.run([rscript, str(script)], cwd=REPO_ROOT, env=env, check=True, capture_output=True)
+        return time.perf_counter() - start
+
+
+# Page template; __WORKER_URL__ is filled in by main()
+HTML_TEMPLATE = '''<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
@@ -232,12 +694,20 @@ html_content = '''<!DOCTYPE html>
 
         .table-container { max-height: calc(100vh - 400px); overflow-y: auto; }
 
-        .results-table { width: 100%; border-collapse: collapse; font-size: 0.85rem; }
-        .results-table th { text-align: left; padding: 0.75rem 1rem; font-weight: 600; color: var(--text-muted); text-transform: uppercase; font-size: 0.7rem; border-bottom: 2px solid var(--border-color); position: sticky; top: 0; background: var(--bg-secondary); }
-        .results-table td { padding: 0.75rem 1rem; border-bottom: 1px solid var(--border-color); color: var(--text-secondary); }
+        .results-table { width: 100%; border-collapse: collapse; font-size: 0.85rem; table-layout: fixed; }
+        .results-table th { text-align: left; padding: 0.75rem 1rem; font-weight: 600; color: var(--text-muted); text-transform: uppercase; font-size: 0.7rem; border-bottom: 2px solid var(--border-color); position: sticky; top: 0; z-index: 1; background: var(--bg-secondary); }
+        .results-table th:nth-child(1) { width: 150px; }
+        .results-table th:nth-child(3) { width: 80px; }
+        .results-table th:nth-child(4) { width: 120px; }
+        .results-table th:nth-child(5) { width: 90px; }
+        .results-table td { padding: 0.75rem 1rem; border-bottom: 1px solid var(--border-color); color: var(--text-secondary); white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }
+        .results-table td > div { overflow: hidden; text-overflow: ellipsis; }
         .results-table tr { cursor: pointer; }
         .results-table tr:hover { background: var(--bg-glass); }
         .results-table tr.selected { background: rgba(102, 126, 234, 0.15); }
+        .results-table tr.spacer, .results-table tr.spacer:hover { background: none; cursor: default; }
+        .results-table tr.spacer td { padding: 0; border: 0; }
+        .results-table tr.pending td { color: var(--text-muted); }
 
         .code-cell { font-family: "SF Mono", monospace; font-weight: 600; color: var(--accent-primary); white-space: nowrap; }
         .desc-short { color: var(--text-primary); font-weight: 500; }
@@ -285,6 +755,13 @@ html_content = '''<!DOCTYPE html>
         .detail-label { font-size: 0.75rem; font-weight: 600; text-transform: uppercase; color: var(--text-muted); margin-bottom: 0.5rem; }
         .detail-value { color: var(--text-secondary); font-size: 0.9rem; line-height: 1.6; }
 
+        .spark { background: var(--bg-glass); border-radius: 10px; padding: 0.75rem; margin-bottom: 0.5rem; }
+        .spark-head { display: flex; justify-content: space-between; font-size: 0.8rem; color: var(--text-muted); margin-bottom: 0.25rem; }
+        .spark-head strong { font-family: monospace; color: var(--text-secondary); }
+        .spark svg { display: block; width: 100%; height: 40px; overflow: visible; }
+        .spark path { fill: none; stroke: var(--accent-primary); stroke-width: 1.5; stroke-linecap: round; stroke-linejoin: round; vector-effect: non-scaling-stroke; }
+        .spark-range { display: flex; justify-content: space-between; font-size: 0.7rem; color: var(--text-muted); }
+
         .breadcrumb { background: var(--bg-glass); border-radius: 10px; padding: 1rem; font-size: 0.85rem; line-height: 1.8; }
         .breadcrumb-sep { color: var(--text-muted); margin: 0 0.25rem; }
 
@@ -352,9 +829,9 @@ html_content = '''<!DOCTYPE html>
             </aside>
             <main class="results-panel">
                 <div class="results-header">
-                    <div class="results-count">Showing <strong id="visibleCount">0</strong> of <strong id="filteredCount">0</strong> codes</div>
+                    <div class="results-count"><strong id="filteredCount">0</strong> of <strong id="totalCount">0</strong> codes</div>
                 </div>
-                <div class="table-container">
+                <div class="table-container" id="tableContainer">
                     <table class="results-table">
                         <thead><tr><th>HS10 Code</th><th>Description</th><th>Chapter</th><th>Tariff</th><th>Units</th></tr></thead>
                         <tbody id="resultsBody"><tr><td colspan="5" class="loading"><div class="spinner"></div></td></tr></tbody>
@@ -371,6 +848,7 @@ html_content = '''<!DOCTYPE html>
         <div class="detail-section"><div class="detail-label">Full Breadcrumb</div><div class="breadcrumb" id="detailBreadcrumb">---</div></div>
         <div class="detail-section"><div class="detail-label">Classification</div><div class="detail-value"><div><strong>Section:</strong> <span id="detailSection">---</span></div><div><strong>Chapter:</strong> <span id="detailChapter">---</span></div></div></div>
         <div class="detail-section"><div class="detail-label">Tariff Rates</div><div class="tariff-grid"><div class="tariff-item"><div class="tariff-type">General</div><div class="tariff-rate" id="detailGeneral">--</div></div><div class="tariff-item"><div class="tariff-type">Special</div><div class="tariff-rate" id="detailSpecial">--</div></div><div class="tariff-item"><div class="tariff-type">Column 2</div><div class="tariff-rate" id="detailOther">--</div></div></div></div>
+        <div class="detail-section"><div class="detail-label">Monthly Imports</div><div id="detailHistory"><div class="detail-value">---</div></div></div>
         <div class="detail-section"><div class="detail-label">Units</div><div class="detail-value" id="detailUnits">---</div></div>
         <div class="detail-section"><div class="detail-label">Code Hierarchy</div><div class="detail-value"><div>HS2: <span id="detailHs2">--</span> | HS4: <span id="detailHs4">--</span> | HS6: <span id="detailHs6">--</span> | HS8: <span id="detailHs8">--</span></div></div></div>
         <div class="action-buttons"><button class="action-btn btn-secondary" onclick="copyCode()">📋 Copy Code</button><button class="action-btn btn-primary" onclick="copyAll()">📝 Copy All</button></div>
@@ -378,39 +856,70 @@ html_content = '''<!DOCTYPE html>
     <div class="toast" id="toast">Copied!</div>
 
     <script>
-        let hsData = {}, hsArray = [], filteredData = [], selectedCode = null, currentChapter = null, displayLimit = 100;
-
-        async function loadData() {
-            try {
-                const response = await fetch('data/hs10_lookup.json');
-                hsData = await response.json();
-                hsArray = Object.values(hsData);
-                filteredData = hsArray;
-                document.getElementById('totalCodes').textContent = hsArray.length.toLocaleString();
-                const chapters = new Set(hsArray.map(d => d.chapter_number));
-                const sections = new Set(hsArray.map(d => d.section_number));
-                document.getElementById('totalChapters').textContent = chapters.size;
-                document.getElementById('totalSections').textContent = sections.size;
-                buildSectionsPanel();
-                renderResults();
-            } catch (e) {
-                document.getElementById('resultsBody').innerHTML = '<tr><td colspan="5" class="empty-state"><div class="empty-state-icon">⚠️</div><div>Failed to load. Ensure hs10_lookup.json is in data folder.</div></td></tr>';
-            }
+        // Data, index and search live in data/hs10_worker.js; this thread only renders the slices it is sent
+        const worker = new Worker('__WORKER_URL__');
+        const SLICE_ROWS = 100, OVERSCAN_ROWS = 10;
+        let total = 0, querySeq = 0, resultSeq = 0, resultCount = 0, rows = new Map(), sliceRequests = new Set();
+        let selectedId = null, selectedItem = null, currentChapter = null;
+        let rowHeight = 64, windowStart = -1, windowEnd = -1, windowScheduled = false;
+
+        worker.onmessage = e => {
+            const m = e.data;
+            if (m.type === 'manifest') onManifest(m);
+            else if (m.type === 'result') onResult(m);
+            else if (m.type === 'slice') onSlice(m);
+            else if (m.type === 'record') onRecord(m);
+            else if (m.type === 'series') onSeries(m);
+            else if (m.type === 'bench') console.table(m.rows);
+            else if (m.type === 'error') showLoadError();
+        };
+        worker.onerror = showLoadError;
+
+        // The worker posts the grouped manifest as soon as it is parsed; records arrive per chapter shard as they are needed
+        function onManifest(m) {
+            total = m.total;
+            document.getElementById('totalCodes').textContent = total.toLocaleString();
+            document.getElementById('totalChapters').textContent = m.sections.reduce((n, s) => n + s.chapters.length, 0);
+            document.getElementById('totalSections').textContent = m.sections.length;
+            buildSectionsPanel(m.sections);
+            runQuery('');
+            if (new URLSearchParams(location.search).has('bench')) worker.postMessage({ type: 'bench', runs: 25 });
         }
 
-        function buildSectionsPanel() {
-            const sections = {};
-            hsArray.forEach(item => {
-                if (!sections[item.section_number]) sections[item.section_number] = { name: item.section_name, chapters: {} };
-                if (!sections[item.section_number].chapters[item.chapter_number]) sections[item.section_number].chapters[item.chapter_number] = { name: item.chapter_name, count: 0 };
-                sections[item.section_number].chapters[item.chapter_number].count++;
-            });
+        function showLoadError() { document.getElementById('resultsBody').innerHTML = '<tr><td colspan="5" class="empty-state"><div class="empty-state-icon">⚠️</div><div>Failed to load. Ensure the hs10_* files and the hs10/ shards are in data folder.</div></td></tr>'; }
+
+        // Each query gets a new seq; replies for an older seq are ignored here and dropped in the worker
+        function runQuery(q, chapter = null) { worker.postMessage({ type: 'query', seq: ++querySeq, q, chapter }); }
+
+        function onResult(m) {
+            if (m.seq !== querySeq) return;
+            resultSeq = m.seq; resultCount = m.count; rows = new Map(); sliceRequests = new Set();
+            document.getElementById('filteredCount').textContent = resultCount.toLocaleString();
+            document.getElementById('totalCount').textContent = total.toLocaleString();
+            document.getElementById('tableContainer').scrollTop = 0;
+            windowStart = windowEnd = -1;
+            renderWindow();
+        }
+
+        function onSlice(m) {
+            if (m.seq !== resultSeq) return;
+            m.rows.forEach((r, i) => rows.set(m.start + i, r));
+            windowStart = -1;
+            scheduleWindow();
+        }
+
+        function requestSlice(k) {
+            if (sliceRequests.has(k)) return;
+            sliceRequests.add(k);
+            worker.postMessage({ type: 'slice', seq: resultSeq, start: k * SLICE_ROWS, end: Math.min(resultCount, (k + 1) * SLICE_ROWS) });
+        }
+
+        function buildSectionsPanel(sections) {
             let html = '';
-            Object.entries(sections).sort((a,b) => parseInt(a[0].match(/\\d+/)?.[0]||0) - parseInt(b[0].match(/\\d+/)?.[0]||0)).forEach(([k, s]) => {
-                const total = Object.values(s.chapters).reduce((sum, c) => sum + c.count, 0);
-                html += `<div class="section-item"><div class="section-header" onclick="toggleSection(this)"><span class="section-arrow">▶</span><span class="section-name">${k.replace('SECTION ','S')}: ${s.name.split(';')[0]}</span><span class="section-count">${total}</span></div><div class="chapters-list">`;
-                Object.entries(s.chapters).sort((a,b) => parseInt(a[0]) - parseInt(b[0])).forEach(([cn, c]) => {
-                    html += `<div class="chapter-item" onclick="filterByChapter(${cn}, this)"><span>Ch ${cn}: ${c.name.substring(0,30)}${c.name.length>30?'...':''}</span><span class="section-count">${c.count}</span></div>`;
+            sections.forEach(s => {
+                html += `<div class="section-item"><div class="section-header" onclick="toggleSection(this)"><span class="section-arrow">▶</span><span class="section-name">${s.number.replace('SECTION ','S')}: ${s.name.split(';')[0]}</span><span class="section-count">${s.count}</span></div><div class="chapters-list">`;
+                s.chapters.forEach(c => {
+                    html += `<div class="chapter-item" onclick="filterByChapter(${c.number}, this)"><span>Ch ${c.number}: ${c.name.substring(0,30)}${c.name.length>30?'...':''}</span><span class="section-count">${c.count}</span></div>`;
                 });
                 html += '</div></div>';
             });
@@ -425,26 +934,16 @@ html_content = '''<!DOCTYPE html>
             currentChapter = ch;
             document.getElementById('searchInput').value = '';
             document.getElementById('searchClear').classList.remove('visible');
-            filteredData = hsArray.filter(d => d.chapter_number === ch);
-            displayLimit = 100;
-            renderResults();
+            runQuery('', ch);
         }
 
-        let searchTimeout;
+        // No debounce: every keystroke is sent and the worker only evaluates the newest
         function handleSearch(q) {
-            clearTimeout(searchTimeout);
             document.getElementById('searchClear').classList.toggle('visible', q.length > 0);
-            searchTimeout = setTimeout(() => {
-                if (!q.trim()) { filteredData = currentChapter ? hsArray.filter(d => d.chapter_number === currentChapter) : hsArray; }
-                else {
-                    const lq = q.toLowerCase();
-                    filteredData = hsArray.filter(d => d.hts10.includes(q) || d.hts10_formatted.includes(q) || d.description_short.toLowerCase().includes(lq) || d.description_raw.toLowerCase().includes(lq) || d.chapter_name.toLowerCase().includes(lq));
-                    currentChapter = null;
-                    document.querySelectorAll('.chapter-item.active').forEach(e => e.classList.remove('active'));
-                }
-                displayLimit = 100;
-                renderResults(q);
-            }, 150);
+            if (!q.trim()) { runQuery('', currentChapter); return; }
+            currentChapter = null;
+            document.querySelectorAll('.chapter-item.active').forEach(e => e.classList.remove('active'));
+            runQuery(q);
         }
 
         function clearSearch() {
@@ -452,33 +951,57 @@ html_content = '''<!DOCTYPE html>
             document.getElementById('searchClear').classList.remove('visible');
             currentChapter = null;
             document.querySelectorAll('.chapter-item.active').forEach(e => e.classList.remove('active'));
-            filteredData = hsArray;
-            displayLimit = 100;
-            renderResults();
+            runQuery('');
         }
 
-        function renderResults(hq = '') {
-            const displayed = filteredData.slice(0, displayLimit);
-            document.getElementById('visibleCount').textContent = Math.min(displayLimit, filteredData.length).toLocaleString();
-            document.getElementById('filteredCount').textContent = filteredData.length.toLocaleString();
-            if (filteredData.length === 0) { document.getElementById('resultsBody').innerHTML = '<tr><td colspan="5" class="empty-state"><div class="empty-state-icon">🔍</div><div>No codes found</div></td></tr>'; return; }
-            let html = '';
-            displayed.forEach(item => {
-                const sd = hq ? highlightText(item.description_short, hq) : item.description_short;
-                const rd = hq ? highlightText(item.description_raw, hq) : item.description_raw;
-                html += `<tr onclick="showDetail('${item.hts10}')" class="${selectedCode === item.hts10 ? 'selected' : ''}"><td class="code-cell">${item.hts10_formatted}</td><td><div class="desc-short">${sd}</div><div class="desc-raw">${rd}</div></td><td>Ch ${item.chapter_number}</td><td class="tariff-cell">${item.general_rate || '--'}</td><td>${item.units || '--'}</td></tr>`;
+        function scheduleWindow() {
+            if (windowScheduled) return;
+            windowScheduled = true;
+            requestAnimationFrame(() => { windowScheduled = false; renderWindow(); });
+        }
+
+        // Draw only the rows in (and just around) the viewport; spacer rows stand in for the rest
+        function renderWindow() {
+            const body = document.getElementById('resultsBody'), container = document.getElementById('tableContainer');
+            if (resultCount === 0) { body.innerHTML = resultSeq ? '<tr><td colspan="5" class="empty-state"><div class="empty-state-icon">🔍</div><div>No codes found</div></td></tr>' : ''; return; }
+            const first = Math.max(0, Math.floor(container.scrollTop / rowHeight) - OVERSCAN_ROWS);
+            const last = Math.min(resultCount, Math.ceil((container.scrollTop + container.clientHeight) / rowHeight) + OVERSCAN_ROWS);
+            if (first === windowStart && last === windowEnd) return;
+            windowStart = first; windowEnd = last;
+            let html = `<tr class="spacer"><td colspan="5" style="height:${first * rowHeight}px"></td></tr>`, pending = false;
+            for (let i = first; i < last; i++) {
+                const r = rows.get(i);
+                if (!r) { pending = true; requestSlice(Math.floor(i / SLICE_ROWS)); html += `<tr class="pending" style="height:${rowHeight}px"><td colspan="5">Loading...</td></tr>`; continue; }
+                html += `<tr data-id="${r.id}" onclick="showDetail(${r.id})" class="${selectedId === r.id ? 'selected' : ''}"><td class="code-cell">${r.code}</td><td><div class="desc-short">${r.short}</div><div class="desc-raw">${r.raw}</div></td><td>Ch ${r.chapter}</td><td class="tariff-cell">${r.general || '--'}</td><td>${r.units || '--'}</td></tr>`;
+            }
+            html += `<tr class="spacer"><td colspan="5" style="height:${(resultCount - last) * rowHeight}px"></td></tr>`;
+            body.innerHTML = html;
+            if (pending) return;
+            // Spacer heights assume every row is rowHeight tall; adopt the real height once rows exist
+            const row = body.querySelector('tr[data-id]'), measured = row ? row.getBoundingClientRect().height : 0;
+            if (measured && Math.abs(measured - rowHeight) > 0.5) { rowHeight = measured; windowStart = -1; renderWindow(); }
+        }
+
+        // Move the highlight by patching the two affected rows rather than redrawing the table
+        function setSelected(id) {
+            const previous = selectedId;
+            selectedId = id;
+            [previous, id].forEach(x => {
+                const row = x === null ? null : document.querySelector(`#resultsBody tr[data-id="${x}"]`);
+                if (row) row.classList.toggle('selected', x === selectedId);
             });
-            if (filteredData.length > displayLimit) html += `<tr onclick="loadMore()"><td colspan="5" style="text-align:center;padding:1rem;color:var(--accent-primary);cursor:pointer;">Load more... (${(filteredData.length - displayLimit).toLocaleString()} remaining)</td></tr>`;
-            document.getElementById('resultsBody').innerHTML = html;
         }
 
-        function highlightText(t, q) { if (!q) return t; return t.replace(new RegExp(`(${q.replace(/[.*+?^${}()|[\\]\\\\]/g, '\\\\$&')})`, 'gi'), '<span class="highlight">$1</span>'); }
-        function loadMore() { displayLimit += 100; renderResults(document.getElementById('searchInput').value); }
+        function showDetail(id) {
+            setSelected(id);
+            document.getElementById('detailHistory').innerHTML = '<div class="detail-value">Loading...</div>';
+            worker.postMessage({ type: 'record', id });
+            worker.postMessage({ type: 'series', id });
+        }
 
-        function showDetail(code) {
-            selectedCode = code;
-            const item = hsData[code];
-            if (!item) return;
+        function onRecord(m) {
+            if (m.id !== selectedId || !m.item) return;
+            const item = selectedItem = m.item;
             document.getElementById('detailCode').textContent = item.hts10_formatted;
             document.getElementById('detailShort').textContent = item.description_short;
             document.getElementById('detailBreadcrumb').innerHTML = item.description_long.split(' > ').map((p, i) => i === 0 ? `<strong>${p}</strong>` : p).join('<span class="breadcrumb-sep"> → </span>');
@@ -493,12 +1016,36 @@ html_content = '''<!DOCTYPE html>
             document.getElementById('detailHs6').textContent = item.hs6;
             document.getElementById('detailHs8').textContent = item.hs8;
             document.getElementById('codeDetail').classList.add('open');
-            renderResults(document.getElementById('searchInput').value);
         }
 
-        function closeDetail() { document.getElementById('codeDetail').classList.remove('open'); selectedCode = null; renderResults(document.getElementById('searchInput').value); }
-        function copyCode() { if (!selectedCode) return; navigator.clipboard.writeText(hsData[selectedCode].hts10_formatted); showToast('Code copied!'); }
-        function copyAll() { if (!selectedCode) return; const i = hsData[selectedCode]; navigator.clipboard.writeText(`HS10: ${i.hts10_formatted}\\nDescription: ${i.description_short}\\nChapter: ${i.chapter_number} - ${i.chapter_name}\\nTariff: ${i.general_rate || 'N/A'}`); showToast('Details copied!'); }
+        // One sparkline per series metric; months without trade leave a gap in the line
+        const SERIES_FORMATS = {
+            trade_value: ['Trade value', v => '$' + new Intl.NumberFormat('en-US', { notation: 'compact', maximumFractionDigits: 1 }).format(v)],
+            tariff_rate: ['Effective rate', v => (100 * v).toFixed(1) + '%']
+        };
+
+        function onSeries(m) {
+            if (m.id !== selectedId) return;
+            const history = document.getElementById('detailHistory');
+            if (!m.metrics) { history.innerHTML = `<div class="detail-value">${m.months.length ? 'No recorded imports' : 'Not available'}</div>`; return; }
+            history.innerHTML = Object.keys(m.metrics).map(k => sparkline(m.metrics[k], m.months, ...SERIES_FORMATS[k])).join('') +
+                `<div class="spark-range"><span>${m.months[0]}</span><span>${m.months[m.months.length - 1]}</span></div>`;
+        }
+
+        function sparkline(values, months, label, format) {
+            const known = values.filter(v => v !== null);
+            if (!known.length) return '';
+            const W = 300, H = 40, lo = Math.min(0, ...known), span = Math.max(...known) - lo || 1;
+            const x = i => values.length > 1 ? (i * W / (values.length - 1)).toFixed(1) : W / 2, y = v => (H - (v - lo) / span * H).toFixed(1);
+            let d = '', lastIndex = -1;
+            values.forEach((v, i) => { if (v === null) return; d += i === lastIndex + 1 && lastIndex >= 0 ? `L${x(i)},${y(v)}` : `M${x(i)},${y(v)}h0`; lastIndex = i; });
+            return `<div class="spark"><div class="spark-head"><span>${label}</span><span><strong>${format(values[lastIndex])}</strong> in ${months[lastIndex]}</span></div>` +
+                `<svg viewBox="0 0 ${W} ${H}" preserveAspectRatio="none"><path d="${d}"/></svg></div>`;
+        }
+
+        function closeDetail() { document.getElementById('codeDetail').classList.remove('open'); setSelected(null); selectedItem = null; }
+        function copyCode() { if (!selectedItem) return; navigator.clipboard.writeText(selectedItem.hts10_formatted); showToast('Code copied!'); }
+        function copyAll() { if (!selectedItem) return; const i = selectedItem; navigator.clipboard.writeText(`HS10: ${i.hts10_formatted}\\nDescription: ${i.description_short}\\nChapter: ${i.chapter_number} - ${i.chapter_name}\\nTariff: ${i.general_rate || 'N/A'}`); showToast('Details copied!'); }
         function showToast(m) { const t = document.getElementById('toast'); t.textContent = m; t.classList.add('show'); setTimeout(() => t.classList.remove('show'), 2000); }
 
         function toggleTheme() {
@@ -509,7 +1056,8 @@ html_content = '''<!DOCTYPE html>
 
         document.addEventListener('DOMContentLoaded', function() {
             if (localStorage.getItem('theme') === 'dark') { document.body.setAttribute('data-theme', 'dark'); document.getElementById('themeIcon').textContent = '☀️'; document.getElementById('themeLabel').textContent = 'Light Mode'; }
-            loadData();
+            document.getElementById('tableContainer').addEventListener('scroll', scheduleWindow, { passive: true });
+            window.addEventListener('resize', scheduleWindow);
         });
 
         document.addEventListener('keydown', function(e) { if (e.key === 'Escape') closeDetail(); if (e.key === '/' && e.target.tagName !== 'INPUT') { e.preventDefault(); document.getElementById('searchInput').focus(); } });
@@ -518,9 +1066,356 @@ html_content = '''<!DOCTYPE html>
 </html>
 '''
 
-html_path = OUTPUT_DIR / "17_hs_code_lookup.html"
-with open(html_path, 'w', encoding='utf-8') as f:
-    f.write(html_content)
-print(f"Created HTML at: {html_path}")
+# Search worker, written as data/hs10_worker.<hash>.js
+WORKER_JS = '''// Search worker for 17_hs_code_lookup.html: owns the manifest, shards and index so parsing, filtering and ranking stay off the UI thread.
+// Paths are relative to this file (data/); the page passes the fingerprinted manifest name as ?manifest=. Generated by create_hs_lookup_page.py.
+let manifest = null, dictionary = null, shards = {}, chapters = [], chapterStarts = [], shardLoads = {};
+let searchIndex = null, indexReady = null, decodedPostings = [], hitMarks = null;
+let latestQuery = 0, resultSeq = 0, resultIds = [], resultHighlight = null;
+
+const manifestReady = fetch(new URLSearchParams(self.location.search).get('manifest') || 'hs10_manifest.json').then(r => r.json()).then(m => {
+    manifest = m;
+    manifest.sections.forEach(s => s.chapters.forEach(c => { c.section = s; chapters.push(c); chapterStarts.push(c.start); }));
+    resultIds = rangeIds(0, manifest.total);
+    indexReady = fetch(manifest.index).then(r => r.json()).then(idx => {
+        searchIndex = idx;
+        decodedPostings = new Array(idx.terms.length);
+        hitMarks = new Uint8Array(manifest.total);
+    });
+    // The page only needs the grouped panel, not the shard paths
+    self.postMessage({
+        type: 'manifest', total: manifest.total,
+        sections: manifest.sections.map(s => ({ number: s.number, name: s.name, count: s.chapters.reduce((sum, c) => sum + c.count, 0), chapters: s.chapters.map(c => ({ number: c.number, name: c.name, count: c.count })) }))
+    });
+});
+const dictionaryReady = manifestReady.then(() => fetch(manifest.dictionary)).then(r => r.json()).then(d => { dictionary = d; });
+
+const handlers = {
+    // A query supersedes every earlier one: anything still queued or waiting on the index is dropped once a newer seq arrives
+    async query({ seq, q, chapter }) {
+        latestQuery = seq;
+        await manifestReady;
+        await yieldToQueue();
+        if (seq !== latestQuery) return;
+        let ids;
+        if (!q.trim()) ids = chapter ? chapterIds(chapter) : rangeIds(0, manifest.total);
+        else {
+            await indexReady;
+            if (seq !== latestQuery) return;
+            ids = searchOrdinals(q);
+        }
+        resultSeq = seq; resultIds = ids; resultHighlight = highlighter(q);
+        self.postMessage({ type: 'result', seq, count: ids.length });
+    },
+    // Display-ready rows for positions [start, end) of the current result
+    async slice({ seq, start, end }) {
+        if (seq !== resultSeq) return;
+        const ids = resultIds.slice(start, end);
+        await ensureLoaded(ids);
+        if (seq !== resultSeq) return;
+        self.postMessage({ type: 'slice', seq, start, rows: ids.map(row) });
+    },
+    async record({ id }) {
+        await manifestReady;
+        await ensureLoaded([id]);
+        self.postMessage({ type: 'record', id, item: record(id) });
+    },
+    async series({ id }) {
+        await manifestReady;
+        await ensureLoaded([id]);
+        self.postMessage({ type: 'series', id, ...(await codeSeries(record(id).hts10)) });
+    },
+    async bench({ runs }) {
+        await indexReady;
+        self.postMessage({ type: 'bench', rows: await runSearchBenchmark(runs) });
+    }
+};
+
+self.onmessage = e => { handlers[e.data.type](e.data).catch(err => self.postMessage({ type: 'error', message: String(err) })); };
+
+// Let any messages already queued behind this one run first, so a burst of keystrokes only evaluates the last
+function yieldToQueue() { return new Promise(resolve => setTimeout(resolve, 0)); }
+
+function rangeIds(start, end) { return Array.from({ length: end - start }, (_, i) => start + i); }
+
+// Chapter whose ordinal slice [start, start + count) contains id
+function chapterOf(id) {
+    let lo = 0, hi = chapterStarts.length - 1;
+    while (lo < hi) { const mid = (lo + hi + 1) >>> 1; if (chapterStarts[mid] <= id) lo = mid; else hi = mid - 1; }
+    return chapters[lo];
+}
+
+function chapterIds(ch) { const c = chapters.find(c => c.number === ch); return c ? rangeIds(c.start, c.start + c.count) : []; }
+
+function loadChapter(c) {
+    if (!shardLoads[c.number]) {
+        shardLoads[c.number] = Promise.all([fetch(c.shard).then(r => r.json()), dictionaryReady]).then(([s]) => { shards[c.number] = decodeShard(s); })
+            .catch(e => { delete shardLoads[c.number]; throw e; });
+    }
+    return shardLoads[c.number];
+}
+
+// Fetch the shards covering the given ordinals, each chapter at most once
+function ensureLoaded(ids) {
+    const needed = new Set();
+    ids.forEach(id => { const c = chapterOf(id); if (!shards[c.number]) needed.add(c); });
+    return Promise.all([...needed].map(loadChapter));
+}
+
+// Columns from encode_shard() in create_hs_lookup_page.py; id columns become typed arrays
+function decodeShard(s) {
+    const crumbStart = new Int32Array(s.crumb_lengths.length + 1);
+    s.crumb_lengths.forEach((n, i) => { crumbStart[i + 1] = crumbStart[i] + n; });
+    return {
+        hts10: s.hts10, short: s.short, strings: s.strings, crumbStart, crumbs: Int32Array.from(s.crumbs), raw: Int32Array.from(s.raw),
+        units: Int32Array.from(s.units), general: Int32Array.from(s.general), special: Int32Array.from(s.special), other: Int32Array.from(s.other)
+    };
+}
+
+// Materialize one row as a plain object, only for rows being rendered or inspected
+function record(id) {
+    const c = chapterOf(id), s = shards[c.number];
+    if (!s) return null;
+    const i = id - c.start, code = s.hts10[i], rates = dictionary.rates;
+    return {
+        id, hts10: code, hts10_formatted: `${code.slice(0, 4)}.${code.slice(4, 6)}.${code.slice(6, 8)}.${code.slice(8)}`,
+        hs2: code.slice(0, 2), hs4: code.slice(0, 4), hs6: code.slice(0, 6), hs8: code.slice(0, 8),
+        description_short: s.short[i], description_raw: s.strings[s.raw[i]],
+        description_long: Array.from(s.crumbs.subarray(s.crumbStart[i], s.crumbStart[i + 1]), k => s.strings[k]).join(' > '),
+        chapter_number: c.number, chapter_name: c.name, section_number: c.section.number, section_name: c.section_name || c.section.name,
+        units: dictionary.units[s.units[i]], general_rate: rates[s.general[i]], special_rate: rates[s.special[i]], other_rate: rates[s.other[i]]
+    };
+}
+
+// Row of one code in the series store from build_series() in create_hs_lookup_page.py, found by binary search over the
+// sorted codes of its index and fetched with a range request. A server that ignores Range answers 200 with the whole
+// file, which is then kept and sliced for later codes instead of being downloaded again.
+let seriesIndex = null, seriesFile = null;
+async function codeSeries(code) {
+    if (!manifest.series) return { months: [], metrics: null };
+    if (!seriesIndex) seriesIndex = fetch(manifest.series).then(r => r.json()).catch(e => { seriesIndex = null; throw e; });
+    const idx = await seriesIndex, codes = idx.codes;
+    let lo = 0, hi = codes.length;
+    while (lo < hi) { const mid = (lo + hi) >>> 1; if (codes[mid] < code) lo = mid + 1; else hi = mid; }
+    if (codes[lo] !== code) return { months: idx.months, metrics: null };
+
+    const start = lo * idx.row_bytes, end = start + idx.row_bytes;
+    let buf;
+    if (!seriesFile) {
+        const r = await fetch(idx.file, { headers: { Range: `bytes=${start}-${end - 1}` } });
+        if (!r.ok) throw new Error(`${idx.file}: HTTP ${r.status}`);
+        if (r.status === 206) buf = await r.arrayBuffer();
+        else seriesFile = r.arrayBuffer();
+    }
+    if (!buf) buf = (await seriesFile).slice(start, end);
+    const view = new DataView(buf), n = idx.months.length, metrics = {};
+    idx.metrics.forEach((name, k) => {
+        metrics[name] = Array.from({ length: n }, (_, j) => { const v = view.getFloat32((k * n + j) * 4, true); return Number.isNaN(v) ? null : v; });
+    });
+    return { months: idx.months, metrics };
+}
+
+// Only the fields the result table shows, with the query terms already highlighted
+function row(id) {
+    const item = record(id), hl = resultHighlight, mark = text => hl ? text.replace(hl, '$1<span class="highlight">$2</span>') : text;
+    return { id, code: item.hts10_formatted, short: mark(item.description_short), raw: mark(item.description_raw), chapter: item.chapter_number, general: item.general_rate, units: item.units };
+}
+
+// One regex per query marking matched token prefixes at word starts (terms are [a-z0-9] only, no escaping needed)
+function highlighter(q) { const terms = tokenize(q || ''); return terms.length ? new RegExp(`(^|[^a-z0-9])(${terms.join('|')})`, 'gi') : null; }
+
+// Same tokenization as tokenize() in create_hs_lookup_page.py
+function tokenize(text) { return text.toLowerCase().match(/[a-z0-9]+/g) || []; }
+
+function lowerBound(arr, key) {
+    let lo = 0, hi = arr.length;
+    while (lo < hi) { const mid = (lo + hi) >>> 1; if (arr[mid] < key) lo = mid + 1; else hi = mid; }
+    return lo;
+}
+
+function postingList(t) {
+    if (!decodedPostings[t]) {
+        const gaps = searchIndex.postings[t], ids = new Int32Array(gaps.length);
+        for (let i = 0, id = 0; i < gaps.length; i++) { id += gaps[i]; ids[i] = id; }
+        decodedPostings[t] = ids;
+    }
+    return decodedPostings[t];
+}
+
+// Sorted ordinals of every record with a description or chapter-name token starting with prefix
+function prefixMatches(prefix) {
+    const { terms, chapter_terms, chapter_postings, chapters } = searchIndex;
+    const lists = [], ranges = [];
+    for (let t = lowerBound(terms, prefix), end = lowerBound(terms, prefix + '\\uffff'); t < end; t++) lists.push(postingList(t));
+    for (let t = lowerBound(chapter_terms, prefix), end = lowerBound(chapter_terms, prefix + '\\uffff'); t < end; t++) chapter_postings[t].forEach(c => ranges.push(chapters[c]));
+    if (lists.length === 1 && ranges.length === 0) return lists[0];
+    hitMarks.fill(0);
+    lists.forEach(ids => { for (let i = 0; i < ids.length; i++) hitMarks[ids[i]] = 1; });
+    ranges.forEach(([, start, end]) => hitMarks.fill(1, start, end));
+    const ids = [];
+    for (let i = 0; i < hitMarks.length; i++) if (hitMarks[i]) ids.push(i);
+    return ids;
+}
+
+function intersectSorted(a, b) {
+    const out = [];
+    for (let i = 0, j = 0; i < a.length && j < b.length;) {
+        if (a[i] < b[j]) i++; else if (a[i] > b[j]) j++; else { out.push(a[i]); i++; j++; }
+    }
+    return out;
+}
+
+// Text queries AND their token prefixes; code queries ("0201.30") add the contiguous range of sorted codes with that prefix
+function searchOrdinals(q) {
+    let ids = null;
+    for (const term of new Set(tokenize(q))) {
+        const hits = prefixMatches(term);
+        ids = ids === null ? Array.from(hits) : intersectSorted(ids, hits);
+        if (ids.length === 0) break;
+    }
+    ids = ids || [];
+    const code = q.replace(/[.\\s]/g, '');
+    if (/^\\d+$/.test(code)) {
+        const lo = lowerBound(searchIndex.codes, code), hi = lowerBound(searchIndex.codes, code + '\\uffff');
+        if (hi > lo) ids = ids.filter(i => i < lo).concat(rangeIds(lo, hi), ids.filter(i => i >= hi));
+    }
+    return ids;
+}
+
+// Previous per-keystroke linear scan, kept as the baseline for runSearchBenchmark()
+function scanSearch(q, items) {
+    const lq = q.toLowerCase();
+    return items.filter(d => d.hts10.includes(q) || d.hts10_formatted.includes(q) || d.description_short.toLowerCase().includes(lq) || d.description_raw.toLowerCase().includes(lq) || d.chapter_name.toLowerCase().includes(lq));
+}
+
+// Index vs. scan query latency, requested by the page with ?bench (loads every shard for the scan)
+async function runSearchBenchmark(runs = 25) {
+    await Promise.all(chapters.map(loadChapter));
+    const items = rangeIds(0, manifest.total).map(record);
+    const queries = ['horse', 'steel', 'cotton shirt', 'lithium batt', 'frozen fish fillets', 'of', 'wood', '8471', '0201.30', '9903'];
+    const median = xs => xs.slice().sort((a, b) => a - b)[xs.length >> 1];
+    const time = fn => { const t0 = performance.now(); fn(); return performance.now() - t0; };
+    return queries.map(q => {
+        decodedPostings.fill(undefined);
+        const indexCold = time(() => searchOrdinals(q)), scan = [], index = [];
+        for (let i = 0; i < runs; i++) { scan.push(time(() => scanSearch(q, items))); index.push(time(() => searchOrdinals(q))); }
+        return {
+            query: q, scan_ms: +median(scan).toFixed(3), index_ms: +median(index).toFixed(3), index_cold_ms: +indexCold.toFixed(3),
+            speedup: +(median(scan) / Math.max(median(index), 0.001)).toFixed(1), scan_hits: scanSearch(q, items).length, index_hits: searchOrdinals(q).length
+        };
+    });
+}
+'''
+
 
-print("Done!")
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build the HS code lookup page and its data assets.")
+    parser.add_argument("--input", type=Path, default=DEFAULT_INPUT, help="hs10_lookup.parquet to read")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="interactive output directory")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the inputs are unchanged")
+    parser.add_argument("--hts-json", type=Path, help="rebuild --input from this USITC htsdata.json first")
+    parser.add_argument("--chapters", type=Path, default=DEFAULT_CHAPTERS, help="chapter and section titles")
+    parser.add_argument("--monthly", type=Path, default=DEFAULT_MONTHLY,
+                        help="monthly_by_hs10.parquet for the per-code trade history (skipped if missing)")
+    parser.add_argument("--compare-r", action="store_true",
+                        help="also time step 1 of 01_prepare_interactive_data.R on --hts-json (needs Rscript)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    src_parquet, output_dir = args.input, args.output
+    data_dir = output_dir / "data"
+    record_path = data_dir / BUILD_RECORD
+
+    if args.hts_json:
+        start = time.perf_counter()
+        with span("parse htsdata.json") as s:
+            count = s["rows"] = build_lookup(args.hts_json, args.chapters, src_parquet)
+        elapsed = time.perf_counter() - start
+        print(f"Parsed {args.hts_json} into {count:,} HS10 codes in {elapsed:.1f}s: "
+              f"{src_parquet} and {src_parquet.with_suffix('.json').name}")
+        if args.compare_r:
+            with span("R step 1 (for comparison)"):
+                r_elapsed = time_r_step1(args.hts_json)
+            if r_elapsed is None:
+                print("Rscript not found, skipping the R step 1 comparison")
+            else:
+                print(f"R step 1 (01_prepare_interactive_data.R): {r_elapsed:.1f}s, "
+                      f"{r_elapsed / elapsed:.1f}x the streaming parse")
+
+    # The page template and worker live in this file, so it is an input too
+    with span("hash inputs"):
+        inputs = {"parquet": file_hash(src_parquet), "script": file_hash(Path(__file__))}
+        if args.monthly.exists():
+            inputs["monthly"] = file_hash(args.monthly)
+    previous = json.loads(record_path.read_text(encoding="utf-8")) if record_path.exists() else {}
+    if (not args.force and previous.get("inputs") == inputs
+            and all((output_dir / name).exists() for name in previous.get("outputs", []))):
+        print(f"Up to date, nothing to do: {output_dir / 'data'} (use --force to rebuild)")
+        return
+
+    with span("load lookup") as s:
+        hs_data = {row["hts10"]: row for row in pq.read_table(src_parquet).to_pylist()}
+        s["rows"] = len(hs_data)
+    print(f"Loaded {len(hs_data):,} HS10 codes from: {src_parquet}")
+
+    assets = AssetWriter(data_dir)
+    with span("search index", rows=len(hs_data)):
+        search_index = build_search_index(hs_data)
+        index_bytes = dump_json(search_index)
+        index_name = assets.put("hs10_index.json", index_bytes)
+    print(f"Built search index: {len(search_index['terms']):,} terms over "
+          f"{len(search_index['codes']):,} codes ({kb(index_bytes)}) at: {data_dir / index_name}")
+
+    with span("chapter shards", rows=len(hs_data)):
+        manifest, dictionary, shards = build_manifest(hs_data, search_index)
+        shard_files = [dump_json(shard) for shard in shards.values()]
+        shard_names = {name: assets.put(name, data) for name, data in zip(shards, shard_files)}
+        for section in manifest["sections"]:
+            for chapter in section["chapters"]:
+                chapter["shard"] = shard_names[chapter["shard"]]
+        dictionary_bytes = dump_json(dictionary)
+        manifest["dictionary"] = assets.put(manifest["dictionary"], dictionary_bytes)
+        manifest["index"] = index_name
+
+    # Trade history: the worker range-requests one row of the matrix per opened code
+    series_name = None
+    if "monthly" in inputs:
+        with span("trade history") as s:
+            series_index, series_bytes = build_series(args.monthly)
+            series_index["file"] = assets.put("hs10_series.f32", series_bytes)
+            series_index_bytes = dump_json(series_index)
+            series_name = manifest["series"] = assets.put("hs10_series.json", series_index_bytes)
+            s["rows"] = len(series_index["codes"])
+        print(f"Wrote trade history of {len(series_index['codes']):,} codes x {len(series_index['months'])} months "
+              f"({kb(series_bytes)}, index {kb(series_index_bytes)}) to: {data_dir / series_index['file']}")
+    else:
+        print(f"No {args.monthly.name} at {args.monthly.parent}, building without trade history")
+    manifest_bytes = dump_json(manifest)
+    manifest_name = assets.put("hs10_manifest.json", manifest_bytes)
+    print(f"Wrote {len(shards)} chapter shards ({kb(*shard_files)}) to: {data_dir / 'hs10'}")
+    print(f"Wrote manifest ({kb(manifest_bytes)}) and dictionary ({kb(dictionary_bytes)}) to: {data_dir}")
+    with span("size report"):
+        print(f"Lookup payload: object-per-code JSON {kb(dump_json(hs_data))} -> "
+              f"columnar {kb(*shard_files, dictionary_bytes, manifest_bytes)}")
+
+    with span("worker and page"):
+        worker_name = assets.put("hs10_worker.js", WORKER_JS.encode("utf-8"))
+        # The page is the only fixed name; it pins the worker, which is told which manifest to load
+        html = HTML_TEMPLATE.replace("__WORKER_URL__", f"data/{worker_name}?manifest={manifest_name}")
+        pages = AssetWriter(output_dir)
+        html_name = pages.put("17_hs_code_lookup.html", html.encode("utf-8"), hashed=False)
+    print(f"Created search worker at: {data_dir / worker_name}")
+    print(f"Created HTML at: {output_dir / html_name}")
+
+    # Drop assets from the previous build that this one no longer references
+    outputs = [f"data/{name}" for name in assets.outputs] + pages.outputs
+    stale = set(previous.get("outputs", [])) - set(outputs)
+    for name in stale:
+        (output_dir / name).unlink(missing_ok=True)
+    record_path.write_text(json.dumps({"inputs": inputs, "outputs": outputs, "series": series_name}, indent=1), encoding="utf-8")
+    print(f"{assets.written + pages.written} of {len(outputs)} files changed, {len(stale)} stale files removed")
+
+if __name__ == "__main__":
+    sys.exit(main())
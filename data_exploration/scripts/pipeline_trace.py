@@ -0,0 +1,139 @@
+"""
+Pipeline tracing for the Python steps, in the format of pipeline_trace.R
+
+Set PIPELINE_TRACE to a file name and every span() records wall time, CPU
+time, peak RSS and an optional row count; at exit the process writes
+<name>.json (Chrome trace-event JSON, for chrome://tracing or
+ui.perfetto.dev) and <name>.summary.tsv (one sorted line per span path,
+diffable against the previous run, which is kept as .summary.prev.tsv).
+Unset, span() does nothing but yield.
+
+    with span("build search index") as s:
+        index = build_search_index(hs_data)
+        s["rows"] = len(index["codes"])
+"""
+import atexit
+import csv
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+PATH = os.environ.get("PIPELINE_TRACE", "")
+_t0 = time.perf_counter()
+_events, _stack = [], []
+
+
+def peak_rss_mb():
+    """Peak RSS of this process in MB since the last reset_peak_rss(); None where unknown."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource  # not on Windows; never reset, so this is the peak since start
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 ** 2 if sys.platform == "darwin" else 1024)
+    except ImportError:
+        return None
+
+
+def reset_peak_rss():
+    """Restart the peak (Linux only); open spans first keep what they have seen."""
+    hwm = peak_rss_mb()
+    for frame in _stack:
+        frame["peak"] = _max(frame["peak"], hwm)
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _max(*values):
+    values = [v for v in values if v is not None]
+    return max(values) if values else None
+
+
+@contextmanager
+def span(name, cat="step", rows=None):
+    """Time the body as a span nested in any open one; set the yielded dict's "rows" to record a count."""
+    if not PATH:
+        yield {}
+        return
+    reset_peak_rss()
+    frame = {"name": name, "peak": None, "rows": rows, "error": False}
+    _stack.append(frame)
+    start, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield frame
+    except BaseException:
+        frame["error"] = True
+        raise
+    finally:
+        peak = _max(frame["peak"], peak_rss_mb())
+        path = " > ".join(f["name"] for f in _stack)
+        _stack.pop()
+        if _stack:
+            _stack[-1]["peak"] = _max(_stack[-1]["peak"], peak)
+        args = {"path": path, "cpu_ms": round(1000 * (time.process_time() - cpu)),
+                "peak_rss_mb": None if peak is None else round(peak), "rows": frame["rows"]}
+        if frame["error"]:
+            args["error"] = True
+        _events.append({"name": name, "cat": cat, "ph": "X", "ts": round((start - _t0) * 1e6),
+                        "dur": round((time.perf_counter() - start) * 1e6), "pid": os.getpid(), "tid": 1, "args": args})
+
+
+SUMMARY_FIELDS = ("path", "calls", "wall_s", "cpu_s", "peak_rss_mb", "rows")
+
+
+def summary(events):
+    rows = {}
+    for e in events:
+        a = e["args"]
+        row = rows.setdefault(a["path"], {"path": a["path"], "calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_rss_mb": None, "rows": 0})
+        row["calls"] += 1
+        row["wall_s"] += e["dur"] / 1e6
+        row["cpu_s"] += a["cpu_ms"] / 1000
+        row["peak_rss_mb"] = _max(row["peak_rss_mb"], a["peak_rss_mb"])
+        row["rows"] = None if row["rows"] is None or a["rows"] is None else row["rows"] + a["rows"]
+    for row in rows.values():
+        row["wall_s"], row["cpu_s"] = round(row["wall_s"], 3), round(row["cpu_s"], 3)
+    return [rows[path] for path in sorted(rows)]
+
+
+def _read_summary(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return {row["path"]: float(row["wall_s"]) for row in csv.DictReader(f, delimiter="\t")}
+
+
+def write(path=None):
+    """Write the trace and its summary, and print the largest wall-time changes against the previous summary."""
+    path = Path(path or PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    meta = {"name": "process_name", "ph": "M", "pid": os.getpid(), "tid": 1, "args": {"name": Path(sys.argv[0]).name}}
+    path.write_text(json.dumps({"traceEvents": [meta, *_events], "displayTimeUnit": "ms"}), encoding="utf-8")
+
+    rows = summary(_events)
+    summary_path = path.with_name(path.name.removesuffix(".json") + ".summary.tsv")
+    if summary_path.exists():
+        before = _read_summary(summary_path)
+        summary_path.replace(summary_path.with_name(summary_path.name.replace(".summary.tsv", ".summary.prev.tsv")))
+        after = {row["path"]: row["wall_s"] for row in rows}
+        changes = sorted(((after.get(p, 0) - before.get(p, 0), p) for p in set(before) | set(after)), key=lambda c: -abs(c[0]))
+        print("\nLargest changes against the previous trace:")
+        for change, p in changes[:10]:
+            print(f"  {change:+9.3f}s  {p}")
+    with open(summary_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, SUMMARY_FIELDS, delimiter="\t")
+        writer.writeheader()
+        writer.writerows({k: "NA" if v is None else v for k, v in row.items()} for row in rows)
+    print(f"Trace of {len(_events)} spans written to {path} (summary: {summary_path})")
+
+
+if PATH:
+    atexit.register(write)
@@ -0,0 +1,460 @@
+"""
+Publish the generated dashboards to docs/: minified, rounded and precompressed
+
+Every file under the interactive output directory (pages, lib/, the HS lookup
+data/) plus shared_nav.js and shared_styles.css is copied to --dest with:
+
+    HTML   comments dropped, whitespace runs collapsed (<pre> and <textarea>
+           kept verbatim), inline <script> and <style> minified as below
+    JSON   embedded htmlwidget payloads and .json files re-serialised
+           compactly, with floats rounded to --digits significant digits
+           (never below the integer part, so 1234567.891 keeps 1234568)
+    JS     comments, indentation and blank lines dropped; strings, template
+           literals and regular expressions are kept as they are, and so are
+           line breaks, so automatic semicolon insertion is unaffected
+    CSS    comments and the whitespace around { } ; , > and after : dropped
+
+Already minified files (*.min.js, *.min.css) and binary files are copied as
+they are. Each compressible file gets .gz and, when the optional brotli
+package is installed, .br siblings for servers that serve precompressed
+files (nginx gzip_static / brotli_static, most CDNs); GitHub Pages ignores
+them and compresses on the fly. Files whose published bytes are unchanged are
+not rewritten.
+
+Pages are checked against the byte budget first: when any published page is
+larger than --budget-kb (or its --page-budget override), nothing is written
+and the script exits with status 1, so an oversized page never reaches docs/.
+
+Every publish records the files it wrote in --dest/.publish_manifest.json.
+After a successful publish, files from the previous manifest that are gone
+from the source are deleted from --dest with their .gz/.br siblings, and so
+are directories left empty. Other files in --dest that did not come from the
+source (static/ plots, anything published before the manifest existed) are
+listed and kept. --prune deletes them too. Hidden files such as .nojekyll are
+never touched.
+
+Usage:
+    python publish_site.py [--source DIR] [--dest docs] [--digits 6] [--prune]
+                           [--budget-kb 512] [--page-budget 16_country_evolution_animation.html=1024]
+"""
+import argparse
+import gzip
+import json
+import math
+import re
+import sys
+from pathlib import Path
+
+from pipeline_trace import span
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Paths (defaults relative to the repository root)
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPT_DIR.parents[1]
+DEFAULT_SOURCE = REPO_ROOT / "data_exploration" / "output" / "interactive"
+DEFAULT_DEST = REPO_ROOT / "docs"
+SHARED_ASSETS = (SCRIPT_DIR / "shared_nav.js", SCRIPT_DIR / "shared_styles.css")
+
+COMPRESSIBLE = {".html", ".js", ".css", ".json", ".svg", ".txt", ".csv", ".xml", ".map", ".f32"}
+MIN_COMPRESS_BYTES = 256  # below this the siblings save less than a request header
+SKIPPED = {".rds", ".gz", ".br"}  # build records and stale siblings of the source tree
+MANIFEST = ".publish_manifest.json"
+
+
+# ============================================================================
+# JSON
+# ============================================================================
+
+def round_float(x, digits):
+    """Round to `digits` significant digits, but never into the integer part."""
+    if x == 0 or not math.isfinite(x):
+        return x
+    decimals = digits - 1 - math.floor(math.log10(abs(x)))
+    if decimals <= 0:
+        return int(round(x)) if abs(x) < 2 ** 53 else x
+    return round(x, decimals)
+
+
+def round_floats(value, digits):
+    if isinstance(value, float):
+        return round_float(value, digits)
+    if isinstance(value, list):
+        return [round_floats(v, digits) for v in value]
+    if isinstance(value, dict):
+        return {k: round_floats(v, digits) for k, v in value.items()}
+    return value
+
+
+def minify_json(text, digits, inline=False):
+    payload = round_floats(json.loads(text), digits)
+    out = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+    # Inside <script> the HTML parser, not JSON, decides where the element ends
+    return out.replace("</", "<\\/").replace("<!--", "<\\u0021--") if inline else out
+
+
+# ============================================================================
+# JAVASCRIPT
+# ============================================================================
+
+# After these a "/" starts a regular expression rather than a division
+REGEX_AFTER_CHARS = set("(,=:[!&|?{};+-*%<>~^}")
+REGEX_AFTER_WORDS = {"return", "typeof", "case", "do", "else", "in", "of", "new", "delete", "void",
+                     "throw", "instanceof", "yield", "await"}
+WORD_RE = re.compile(r"[A-Za-z0-9_$]")
+
+
+def _regex_allowed(src, i):
+    j = i - 1
+    while j >= 0 and src[j] in " \t\r\n":
+        j -= 1
+    if j < 0:
+        return True
+    if WORD_RE.match(src[j]):
+        start = j
+        while start > 0 and WORD_RE.match(src[start - 1]):
+            start -= 1
+        return src[start:j + 1] in REGEX_AFTER_WORDS
+    return src[j] in REGEX_AFTER_CHARS
+
+
+def _scan_quoted(src, i, quote):
+    """End of the string literal opening at i."""
+    j = i + 1
+    while j < len(src) and src[j] != quote:
+        if src[j] == "\n":
+            raise ValueError(f"unterminated string at {i}")
+        j += 2 if src[j] == "\\" else 1
+    if j >= len(src):
+        raise ValueError(f"unterminated string at {i}")
+    return j + 1
+
+
+def _scan_regex(src, i):
+    """End of the regular expression literal (flags included) opening at i."""
+    j, in_class = i + 1, False
+    while j < len(src):
+        c = src[j]
+        if c == "\n":
+            raise ValueError(f"unterminated regular expression at {i}")
+        if c == "\\":
+            j += 2
+            continue
+        if c == "[":
+            in_class = True
+        elif c == "]":
+            in_class = False
+        elif c == "/" and not in_class:
+            break
+        j += 1
+    j += 1
+    while j < len(src) and WORD_RE.match(src[j]):
+        j += 1
+    return j
+
+
+def _js_chunks(src):
+    """Split source into (is_code, text) chunks, comments removed; literals are never code."""
+    chunks, code = [], []
+    templates = []  # open brace depth of each ${...} we are inside
+    i, n = 0, len(src)
+
+    def literal(text):
+        chunks.append((True, "".join(code)))
+        code.clear()
+        chunks.append((False, text))
+
+    while i < n:
+        c = src[i]
+        if c == "`" or (c == "}" and templates and templates[-1] == 0):
+            # Template literal text up to its end or the next ${
+            if c == "}":
+                templates.pop()
+            j = i + 1
+            while j < n and src[j] != "`" and not src.startswith("${", j):
+                j += 2 if src[j] == "\\" else 1
+            if j >= n:
+                raise ValueError(f"unterminated template literal at {i}")
+            if src[j] == "`":
+                j += 1
+            else:
+                j += 2
+                templates.append(0)
+            literal(src[i:j])
+            i = j
+        elif c in "'\"":
+            j = _scan_quoted(src, i, c)
+            literal(src[i:j])
+            i = j
+        elif src.startswith("//", i):
+            j = src.find("\n", i)
+            i = n if j < 0 else j
+        elif src.startswith("/*", i):
+            j = src.find("*/", i + 2)
+            if j < 0:
+                raise ValueError(f"unterminated comment at {i}")
+            # A comment spanning lines still ends a statement for semicolon insertion
+            code.append("\n" if "\n" in src[i:j] else " ")
+            i = j + 2
+        elif c == "/" and _regex_allowed(src, i):
+            j = _scan_regex(src, i)
+            literal(src[i:j])
+            i = j
+        else:
+            if templates and c in "{}":
+                templates[-1] += 1 if c == "{" else -1
+            code.append(c)
+            i += 1
+    chunks.append((True, "".join(code)))
+    return chunks
+
+
+def minify_js(src):
+    out = []
+    for is_code, text in _js_chunks(src):
+        if is_code:
+            text = re.sub(r"[ \t\r]*\n\s*", "\n", text)
+            text = re.sub(r"[ \t]{2,}", " ", text)
+        out.append(text)
+    return "".join(out).strip()
+
+
+# ============================================================================
+# CSS
+# ============================================================================
+
+CSS_STRING = r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\''
+CSS_COMMENT_RE = re.compile(rf"({CSS_STRING})|/\*.*?\*/", re.S)
+CSS_STRING_RE = re.compile(CSS_STRING)
+
+
+def minify_css(src):
+    # Comments out first (strings kept), then whitespace outside strings
+    css = CSS_COMMENT_RE.sub(lambda m: m.group(1) or " ", src)
+    out, pos = [], 0
+    for m in CSS_STRING_RE.finditer(css):
+        out.append(_squeeze_css(css[pos:m.start()]))
+        out.append(m.group(0))
+        pos = m.end()
+    out.append(_squeeze_css(css[pos:]))
+    return "".join(out).strip()
+
+
+def _squeeze_css(code):
+    code = re.sub(r"\s+", " ", code)
+    code = re.sub(r"\s*([{};,>])\s*", r"\1", code)
+    return re.sub(r":\s+", ":", code).replace(";}", "}")
+
+
+# ============================================================================
+# HTML
+# ============================================================================
+
+RAW_ELEMENT_RE = re.compile(r"<(script|style|pre|textarea)\b([^>]*)>(.*?)</\1\s*>", re.I | re.S)
+COMMENT_RE = re.compile(r"<!--(?!\[if).*?-->", re.S)
+TYPE_RE = re.compile(r"""\btype\s*=\s*["']?([^"'\s>]+)""", re.I)
+JS_TYPES = {"", "text/javascript", "application/javascript", "module"}
+
+
+def _squeeze_html(text):
+    text = COMMENT_RE.sub("", text)
+    text = re.sub(r"\s*\n\s*", "\n", text)
+    return re.sub(r"[ \t]+", " ", text)
+
+
+def _minify_element(m, digits):
+    tag, attrs, body = m.group(1).lower(), m.group(2), m.group(3)
+    if tag == "script":
+        kind = TYPE_RE.search(attrs)
+        kind = kind.group(1).lower() if kind else ""
+        try:
+            if kind in JS_TYPES:
+                body = minify_js(body)
+            elif kind.endswith("json") or kind == "application/htmlwidget-sizing":
+                body = minify_json(body, digits, inline=True)
+        except ValueError as e:  # a construct the minifier does not follow: keep this script as it is
+            print(f"  kept an inline script unminified ({e})")
+    elif tag == "style":
+        body = minify_css(body)
+    return f"<{m.group(1)}{_squeeze_html(attrs)}>{body}</{m.group(1)}>"
+
+
+def minify_html(html, digits):
+    out, pos = [], 0
+    for m in RAW_ELEMENT_RE.finditer(html):
+        out.append(_squeeze_html(html[pos:m.start()]))
+        out.append(_minify_element(m, digits))
+        pos = m.end()
+    out.append(_squeeze_html(html[pos:]))
+    return "".join(out).strip() + "\n"
+
+
+# ============================================================================
+# PUBLISHING
+# ============================================================================
+
+def publish_bytes(path, digits):
+    """Bytes to publish for one source file."""
+    data = path.read_bytes()
+    name, ext = path.name.lower(), path.suffix.lower()
+    if ext not in {".html", ".js", ".css", ".json"} or ".min." in name:
+        return data
+    text = data.decode("utf-8")
+    try:
+        if ext == ".html":
+            text = minify_html(text, digits)
+        elif ext == ".js":
+            text = minify_js(text)
+        elif ext == ".css":
+            text = minify_css(text)
+        else:
+            text = minify_json(text, digits)
+    except ValueError as e:
+        print(f"  {path.name}: published unminified ({e})")
+        return data
+    return text.encode("utf-8")
+
+
+def compressed(data):
+    siblings = {".gz": gzip.compress(data, 9, mtime=0)}
+    if brotli is not None:
+        siblings[".br"] = brotli.compress(data, quality=11)
+    return siblings
+
+
+def write_if_changed(path, data):
+    if path.exists() and path.stat().st_size == len(data) and path.read_bytes() == data:
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return True
+
+
+def source_files(source):
+    files = {p.relative_to(source).as_posix(): p for p in sorted(source.rglob("*"))
+             if p.is_file() and not any(part.startswith(".") for part in p.relative_to(source).parts)
+             and p.suffix.lower() not in SKIPPED}
+    for path in SHARED_ASSETS:
+        files.setdefault(path.name, path)
+    return files
+
+
+def remove_stale(dest, files, prune_unknown):
+    """Delete what earlier publishes wrote that the source no longer has; list (or prune) other extra files."""
+    manifest = dest / MANIFEST
+    previous = set(json.loads(manifest.read_text(encoding="utf-8"))) if manifest.exists() else set()
+    owned = {f"{rel}{suffix}" for rel in files for suffix in ("", ".gz", ".br")}
+    removed, unknown = [], []
+    for path in sorted(p for p in dest.rglob("*") if p.is_file()):
+        rel = path.relative_to(dest).as_posix()
+        if rel in owned or any(part.startswith(".") for part in path.relative_to(dest).parts):
+            continue
+        primary = re.sub(r"\.(gz|br)$", "", rel)
+        if primary in previous or prune_unknown:
+            path.unlink()
+            removed.append(rel)
+        else:
+            unknown.append(rel)
+    for d in sorted((p for p in dest.rglob("*") if p.is_dir()), key=lambda p: len(p.parts), reverse=True):
+        if not any(part.startswith(".") for part in d.relative_to(dest).parts) and not any(d.iterdir()):
+            d.rmdir()
+    write_if_changed(manifest, json.dumps(sorted(files), indent=0).encode("utf-8"))
+    return removed, unknown
+
+
+def parse_budgets(default_kb, overrides):
+    budgets = {}
+    for item in overrides:
+        page, _, kb = item.partition("=")
+        if not kb:
+            raise SystemExit(f"--page-budget takes PAGE=KB, got {item!r}")
+        budgets[page] = float(kb)
+    return lambda page: budgets.get(page, default_kb) * 1024
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Publish minified, precompressed dashboards to docs/.")
+    parser.add_argument("--source", type=Path, default=DEFAULT_SOURCE, help="interactive output directory")
+    parser.add_argument("--dest", type=Path, default=DEFAULT_DEST, help="site directory to publish to")
+    parser.add_argument("--digits", type=int, default=6, help="significant digits kept in embedded floats")
+    parser.add_argument("--budget-kb", type=float, default=512, help="largest allowed published page, in KB")
+    parser.add_argument("--page-budget", action="append", default=[], metavar="PAGE=KB",
+                        help="budget for one page, e.g. 16_country_evolution_animation.html=1024 (repeatable)")
+    parser.add_argument("--prune", action="store_true",
+                        help="also delete files in --dest that no publish wrote (by default they are only listed)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not args.source.is_dir():
+        raise SystemExit(f"Source directory not found: {args.source}")
+    budget = parse_budgets(args.budget_kb, args.page_budget)
+    files = source_files(args.source)
+    if brotli is None:
+        print("brotli is not installed (pip install brotli): writing .gz siblings only")
+
+    # Pages first: an over-budget page stops the publish before anything is written
+    pages = {rel: path for rel, path in files.items() if rel.endswith(".html") and "/" not in rel}
+    published, over = {}, []
+    print(f"{'page':<44}{'source KB':>11}{'published':>11}{'gzip':>9}{'brotli':>9}{'budget':>9}")
+    with span("minify pages", rows=len(pages)):
+        for rel, path in pages.items():
+            data = published[rel] = publish_bytes(path, args.digits)
+            siblings = compressed(data)
+            limit = budget(rel)
+            br = f"{len(siblings['.br']) / 1024:9,.0f}" if ".br" in siblings else f"{'-':>9}"
+            flag = "" if len(data) <= limit else "  OVER BUDGET"
+            print(f"{rel:<44}{path.stat().st_size / 1024:11,.0f}{len(data) / 1024:11,.0f}"
+                  f"{len(siblings['.gz']) / 1024:9,.0f}{br}{limit / 1024:9,.0f}{flag}")
+            if flag:
+                over.append(rel)
+    if over:
+        print(f"\n{len(over)} page(s) over budget, nothing published: {', '.join(over)}")
+        print("Shrink them or raise the budget with --budget-kb / --page-budget PAGE=KB")
+        sys.exit(1)
+
+    totals = {"source": 0, "published": 0, ".gz": 0, ".br": 0}
+    written = 0
+    with span("publish assets", rows=len(files)):
+        for rel, path in files.items():
+            data = published.get(rel)
+            if data is None:
+                data = publish_bytes(path, args.digits)
+            target = args.dest / rel
+            written += write_if_changed(target, data)
+            totals["source"] += path.stat().st_size
+            totals["published"] += len(data)
+            siblings = compressed(data) if target.suffix.lower() in COMPRESSIBLE and len(data) >= MIN_COMPRESS_BYTES else {}
+            for suffix in (".gz", ".br"):
+                sibling = target.with_name(target.name + suffix)
+                packed = siblings.get(suffix)
+                if packed is not None and len(packed) < len(data):
+                    written += write_if_changed(sibling, packed)
+                else:
+                    packed = data
+                    if sibling.exists():
+                        sibling.unlink()
+                        written += 1
+                totals[suffix] += len(packed)
+
+    with span("remove stale files"):
+        removed, unknown = remove_stale(args.dest, files, args.prune)
+    written += len(removed)
+
+    mb = lambda n: f"{n / 1024 ** 2:,.1f} MB"
+    print(f"\nPublished {len(files)} files to {args.dest} ({written} files written or removed)")
+    if removed:
+        print(f"Removed {len(removed)} file(s) no longer in the source: " + ", ".join(removed[:10]) + (" ..." if len(removed) > 10 else ""))
+    if unknown:
+        print(f"Kept {len(unknown)} file(s) in {args.dest} that are not from the source (--prune deletes them): "
+              + ", ".join(unknown[:10]) + (" ..." if len(unknown) > 10 else ""))
+    print(f"Source {mb(totals['source'])} -> published {mb(totals['published'])}, "
+          f"gzip {mb(totals['.gz'])}" + (f", brotli {mb(totals['.br'])}" if brotli is not None else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,609 @@
+"""
+Local query service for the processed aggregates (monthly_by_*, top_entities_*)
+
+The dashboards embed fixed snapshots of data/processed/*.parquet. This service
+answers on-demand slices of the same tables over HTTP, so a new top-N, chapter
+subset or date window needs no R rerun and no redeploy:
+
+    GET /tables                                   every table, its columns and date range
+    GET /query/<table>?<params>                   a slice, as JSON (default) or Arrow
+    GET /stats                                    cache and request counters
+
+Query parameters (all optional):
+
+    columns=a,b        column projection (returned in table order)
+    <column>=x,y       keep rows whose column is one of the values (e.g. chapter=84,85)
+    prefix=85          keep codes starting with this (HTS_Number, hs6 or chapter)
+    from=2025-01       first month, inclusive (monthly tables)
+    to=2025-08         last month, inclusive
+    group=Country      sum trade_value, tariff_paid, cif_value, freight and quantity
+                       per group over the window; tariff_rate is recomputed, n_rows
+                       (rows summed) added, other columns dropped
+    order=-trade_value sort, "-" for descending; several keys comma-separated
+    limit=20           first N rows after sorting
+    format=json|arrow  JSON columns ({"columns": {name: [...]}}) or an Arrow IPC stream
+
+Filters and the projection are handed to pyarrow.dataset, so they are applied
+while scanning. Row groups whose statistics rule them out are skipped. When
+01_prepare_interactive_data.R has written the month-partitioned store
+(data/processed/partitioned/<table>/month=YYYY-MM/), monthly tables are read
+from it, and a date window opens only its months' files.
+
+Results are cached as encoded response bodies in an LRU keyed by the
+normalised query (parameter order, value order and spelling of the same window
+do not matter) plus the table file's mtime and size, and evicted by total
+bytes (--cache-mb). A rerun of the prep step therefore invalidates every
+cached slice of the tables it rewrote. Scans run on a thread pool while the
+event loop keeps serving. Identical queries that arrive while the first is
+still scanning wait for its result rather than scanning again. Responses carry
+X-Cache: hit|miss and Access-Control-Allow-Origin: *, so pages opened from
+file:// or the published site can fetch from it.
+
+`loadtest` replays a Zipf-weighted mix of dashboard-style queries against a
+running service over keep-alive connections and reports throughput and
+p50/p90/p99 latency, overall and split by cache hits and misses.
+
+Usage:
+    python query_service.py serve [--host 127.0.0.1] [--port 8765] [--data-dir DIR] [--cache-mb 128] [--workers N]
+    python query_service.py loadtest [--url http://127.0.0.1:8765] [--requests 5000] [--concurrency 32]
+                                     [--distinct 200] [--seed 1]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import math
+import os
+import random
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPT_DIR.parents[1]
+DEFAULT_DATA_DIR = REPO_ROOT / "data" / "processed"
+DEFAULT_PORT = 8765
+TABLE_PATTERNS = ("monthly_by_*.parquet", "top_entities_*.parquet")
+CODE_COLUMNS = {"HTS_Number": 10, "hs6": 6, "chapter": 2}  # what prefix= filters on (first present), and code width
+SUM_COLUMNS = ("trade_value", "tariff_paid", "cif_value", "freight", "quantity")  # additive across months and groups
+RESERVED = {"columns", "prefix", "from", "to", "group", "order", "limit", "format"}
+CONTENT_TYPES = {"json": "application/json", "arrow": "application/vnd.apache.arrow.stream"}
+
+
+class QueryError(ValueError):
+    """A request the service cannot answer; status is the HTTP status to send."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# ============================================================================
+# QUERY PARSING
+# ============================================================================
+
+def month_start(text, param):
+    try:
+        return datetime.date(int(text[:4]), int(text[5:7]), 1)
+    except (ValueError, IndexError):
+        raise QueryError(f"{param}= must be YYYY-MM, got {text!r}") from None
+
+
+def next_month(day):
+    return datetime.date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def normalise(table, params, schema):
+    """Check a query against the table's schema and return it in canonical, hashable form."""
+    names = schema.names
+    unknown = lambda cols, known=names: [c for c in cols if c not in known]  # noqa: E731
+    split = lambda v: [x for x in v.split(",") if x]  # noqa: E731
+
+    group = split(params.get("group", ""))
+    if unknown(group):
+        raise QueryError(f"Unknown group columns for {table}: {', '.join(unknown(group))}")
+    output = names
+    if group:
+        sums = [c for c in SUM_COLUMNS if c in names and c not in group]
+        if not sums:
+            raise QueryError(f"{table} has no additive columns to group")
+        output = group + sums + (["tariff_rate"] if {"trade_value", "tariff_paid"} <= set(sums) else []) + ["n_rows"]
+    columns = split(params["columns"]) if "columns" in params else output
+    if unknown(columns, output):
+        raise QueryError(f"Unknown columns for {table}: {', '.join(unknown(columns, output))}")
+    filters = {k: v for k, v in params.items() if k not in RESERVED}
+    if unknown(filters):
+        raise QueryError(f"Unknown parameters for {table}: {', '.join(unknown(filters))}")
+
+    window = [month_start(params[p], p) if params.get(p) else None for p in ("from", "to")]
+    if any(window) and "date" not in names:
+        raise QueryError(f"{table} has no date column; from= and to= apply to monthly tables")
+    prefix = params.get("prefix") or None
+    code_column = next((c for c in CODE_COLUMNS if c in names), None)
+    if prefix and code_column is None:
+        raise QueryError(f"{table} has no code column for prefix=")
+
+    order = []
+    for key in split(params.get("order", "")):
+        name = key.lstrip("-")
+        if name not in output:
+            raise QueryError(f"Cannot order {table} by {name!r}")
+        order.append((name, "descending" if key.startswith("-") else "ascending"))
+    try:
+        limit = int(params["limit"]) if params.get("limit") else None
+        if limit is not None and limit < 0:
+            raise ValueError
+    except ValueError:
+        raise QueryError(f"limit= must be a non-negative integer, got {params['limit']!r}") from None
+    fmt = params.get("format", "json")
+    if fmt not in CONTENT_TYPES:
+        raise QueryError(f"format= must be one of {', '.join(CONTENT_TYPES)}")
+
+    return (
+        table,
+        tuple(sorted(set(columns), key=output.index)),
+        tuple(sorted((k, tuple(sorted(set(split(v))))) for k, v in filters.items())),
+        tuple(d.isoformat() if d else None for d in window),
+        prefix, code_column, tuple(group), tuple(order), limit, fmt,
+    )
+
+
+def build_filter(query, schema, partitioned):
+    """Dataset filter expression for the row predicates of a normalised query."""
+    _, _, filters, (start, end), prefix, code_column, *_ = query
+    terms = []
+    for name, values in filters:
+        try:
+            terms.append(ds.field(name).isin(pc.cast(pa.array(values), schema.field(name).type)))
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            raise QueryError(f"Values for {name} do not fit its type {schema.field(name).type}") from None
+    if start:
+        start = datetime.date.fromisoformat(start)
+        terms.append(ds.field("date") >= pa.scalar(start, pa.date32()))
+        if partitioned:
+            terms.append(ds.field("month") >= start.strftime("%Y-%m"))
+    if end:
+        end = datetime.date.fromisoformat(end)
+        terms.append(ds.field("date") < pa.scalar(next_month(end), pa.date32()))
+        if partitioned:
+            terms.append(ds.field("month") <= end.strftime("%Y-%m"))
+    if prefix:
+        code = ds.field(code_column)
+        if not pa.types.is_string(schema.field(code_column).type):  # integer chapters: 8 -> "08"
+            code = pc.utf8_lpad(code.cast(pa.string()), width=CODE_COLUMNS[code_column], padding="0")
+        terms.append(pc.starts_with(code, pattern=prefix))
+    expr = None
+    for term in terms:
+        expr = term if expr is None else expr & term
+    return expr
+
+
+# ============================================================================
+# TABLES AND EXECUTION
+# ============================================================================
+
+class Aggregates:
+    """The processed tables, reopened whenever the prep step rewrites them."""
+
+    def __init__(self, data_dir=DEFAULT_DATA_DIR):
+        self.data_dir = Path(data_dir)
+        self.store_dir = self.data_dir / "partitioned"
+        self._opened = {}
+
+    def names(self):
+        return sorted(p.stem for pattern in TABLE_PATTERNS for p in self.data_dir.glob(pattern))
+
+    def version(self, table):
+        """mtime and size of the flat file, rewritten by every full and incremental prep run."""
+        if "/" in table or not any(fnmatchcase(f"{table}.parquet", p) for p in TABLE_PATTERNS):
+            raise QueryError(f"Unknown table: {table!r}", status=404)
+        try:
+            st = (self.data_dir / f"{table}.parquet").stat()
+        except OSError:
+            raise QueryError(f"Unknown table: {table!r}", status=404) from None
+        return st.st_mtime_ns, st.st_size
+
+    def is_open(self, table, version):
+        return table in self._opened and self._opened[table][0] == version
+
+    def open(self, table, version):
+        """(dataset, schema without the partition key, partitioned?) for this version of the table."""
+        if self.is_open(table, version):
+            return self._opened[table][1]
+        parts = self.store_dir / table
+        if table.startswith("monthly_") and any(parts.glob("month=*")):
+            partitioning = ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive")
+            dataset = ds.dataset(parts, format="parquet", partitioning=partitioning)
+            schema = pa.schema([f for f in dataset.schema if f.name != "month"])
+            opened = (dataset, schema, True)
+        else:
+            dataset = ds.dataset(self.data_dir / f"{table}.parquet", format="parquet")
+            opened = (dataset, dataset.schema, False)
+        self._opened[table] = (version, opened)
+        return opened
+
+    def describe(self):
+        tables = {}
+        for name in self.names():
+            dataset, schema, partitioned = self.open(name, self.version(name))
+            info = {"columns": {f.name: str(f.type) for f in schema}, "rows": dataset.count_rows(),
+                    "source": "partitioned" if partitioned else "flat"}
+            if "date" in schema.names:
+                bounds = pc.min_max(dataset.to_table(columns=["date"])["date"]).as_py()
+                info["months"] = [d.strftime("%Y-%m") if d else None for d in (bounds["min"], bounds["max"])]
+            tables[name] = info
+        return tables
+
+    def run(self, query, version):
+        """Scan, aggregate, sort and encode one normalised query; returns the response body."""
+        table, columns, _, _, _, _, group, order, limit, fmt = query
+        dataset, schema, partitioned = self.open(table, version)
+        expr = build_filter(query, schema, partitioned)
+        if group:
+            sums = [c for c in SUM_COLUMNS if c in schema.names and c not in group]
+            result = dataset.to_table(columns=list(group) + sums, filter=expr)
+            result = result.group_by(list(group)).aggregate([(c, "sum") for c in sums] + [([], "count_all")])
+            result = result.rename_columns([{"count_all": "n_rows"}.get(n, n.removesuffix("_sum")) for n in result.column_names])
+            if {"trade_value", "tariff_paid"} <= set(sums):
+                value = result["trade_value"]
+                rate = pc.if_else(pc.greater(value, 0), pc.divide(result["tariff_paid"], value), pa.scalar(None, pa.float64()))
+                result = result.append_column("tariff_rate", rate)
+        else:
+            needed = list(dict.fromkeys(list(columns) + [name for name, _ in order]))
+            result = dataset.to_table(columns=needed, filter=expr)
+        if order and limit and limit < result.num_rows:
+            result = result.take(pc.select_k_unstable(result, limit, list(order)))
+        if order:
+            result = result.sort_by(list(order))
+        if limit is not None:
+            result = result.slice(0, limit)
+        return encode(result.select(list(columns)), fmt)
+
+
+def encode(table, fmt):
+    if fmt == "arrow":
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    data = {}
+    for name, col in zip(table.column_names, table.columns):
+        if pa.types.is_floating(col.type):
+            col = pc.if_else(pc.is_nan(col), pa.scalar(None, col.type), col)  # R writes 0/0 rates as NaN
+        elif pa.types.is_temporal(col.type):
+            col = col.cast(pa.string())
+        data[name] = col.to_pylist()
+    return json.dumps({"rows": table.num_rows, "columns": data}, separators=(",", ":")).encode()
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class ResultCache:
+    """LRU of encoded results, bounded by the total bytes of the bodies it holds."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        body = self.entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes or key in self.entries:
+            return
+        while self.bytes + len(body) > self.max_bytes:
+            _, old = self.entries.popitem(last=False)
+            self.bytes -= len(old)
+            self.evictions += 1
+        self.entries[key] = body
+        self.bytes += len(body)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"entries": len(self.entries), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None}
+
+
+# ============================================================================
+# SERVER
+# ============================================================================
+
+class QueryService:
+    def __init__(self, aggregates, cache_bytes, workers):
+        self.aggregates = aggregates
+        self.cache = ResultCache(cache_bytes)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan")
+        self.inflight = {}
+        self.requests = self.errors = 0
+
+    async def answer(self, path, params):
+        """(status, content type, body, cache state) for one GET."""
+        loop = asyncio.get_running_loop()
+        if path == "/tables":
+            tables = await loop.run_in_executor(self.pool, self.aggregates.describe)
+            return 200, CONTENT_TYPES["json"], json.dumps(tables).encode(), None
+        if path == "/stats":
+            stats = {"requests": self.requests, "errors": self.errors, "inflight": len(self.inflight), "cache": self.cache.stats()}
+            return 200, CONTENT_TYPES["json"], json.dumps(stats).encode(), None
+        if not path.startswith("/query/"):
+            raise QueryError(f"No such endpoint: {path}", status=404)
+
+        table = path.removeprefix("/query/")
+        version = self.aggregates.version(table)
+        if self.aggregates.is_open(table, version):
+            _, schema, _ = self.aggregates.open(table, version)
+        else:  # listing the partitions touches the disk, so not on the event loop
+            _, schema, _ = await loop.run_in_executor(self.pool, self.aggregates.open, table, version)
+        query = normalise(table, params, schema)
+        key = (query, version)
+        content_type = CONTENT_TYPES[query[-1]]
+        body = self.cache.get(key)
+        if body is not None:
+            return 200, content_type, body, "hit"
+        if key not in self.inflight:
+            self.inflight[key] = loop.run_in_executor(self.pool, self.aggregates.run, query, version)
+            try:
+                body = await self.inflight[key]
+            finally:
+                del self.inflight[key]
+            self.cache.put(key, body)
+        else:
+            body = await asyncio.shield(self.inflight[key])
+        return 200, content_type, body, "miss"
+
+    async def handle(self, reader, writer):
+        """One connection: HTTP/1.1 GETs, kept alive until the client closes or asks to."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get("content-length") or 0):
+                    await reader.readexactly(int(headers["content-length"]))
+
+                self.requests += 1
+                cache_state = None
+                url = urlsplit(target)
+                try:
+                    if method not in ("GET", "HEAD"):
+                        raise QueryError(f"Method {method} not allowed", status=405)
+                    status, content_type, body, cache_state = await self.answer(url.path.rstrip("/") or "/", dict(parse_qsl(url.query)))
+                except QueryError as e:
+                    self.errors += 1
+                    status, content_type, body = e.status, CONTENT_TYPES["json"], json.dumps({"error": str(e)}).encode()
+                except Exception as e:  # a failed scan answers 500 and keeps the server up
+                    self.errors += 1
+                    status, content_type, body = 500, CONTENT_TYPES["json"], json.dumps({"error": f"{type(e).__name__}: {e}"}).encode()
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Error')}", f"Content-Type: {content_type}",
+                        f"Content-Length: {len(body)}", "Access-Control-Allow-Origin: *",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                if cache_state:
+                    head.append(f"X-Cache: {cache_state}")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+                if method != "HEAD":
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # client went away or sent something that is not HTTP
+        finally:
+            writer.close()
+
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+async def serve(args):
+    aggregates = Aggregates(args.data_dir)
+    if not aggregates.names():
+        raise SystemExit(f"No monthly_by_*/top_entities_* tables in {args.data_dir}; run 01_prepare_interactive_data.R first")
+    service = QueryService(aggregates, int(args.cache_mb * 1024 ** 2), args.workers)
+    server = await asyncio.start_server(service.handle, args.host, args.port)
+    print(f"Serving {len(aggregates.names())} tables from {args.data_dir} on http://{args.host}:{args.port} "
+          f"(cache {args.cache_mb:g} MB, {args.workers} scan threads)")
+    print(f"  try http://{args.host}:{args.port}/query/monthly_by_country?group=Country&from=2025-01&order=-trade_value&limit=10")
+    async with server:
+        await server.serve_forever()
+
+
+# ============================================================================
+# LOAD TEST
+# ============================================================================
+
+class Connection:
+    """A keep-alive HTTP/1.1 client connection; get() returns (status, headers, body)."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def get(self, target):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(f"GET {target} HTTP/1.1\r\nHost: {self.host}\r\n\r\n".encode("latin-1"))
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while (line := await self.reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        body = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection") == "close":
+            await self.close()
+        return status, headers, body
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+def month_list(first, last):
+    months, day = [], month_start(first, "from")
+    while day.strftime("%Y-%m") <= last:
+        months.append(day.strftime("%Y-%m"))
+        day = next_month(day)
+    return months
+
+
+def query_mix(tables, chapters, n, rng):
+    """n distinct dashboard-style queries: top-N in a window, chapter subsets, code drill-downs."""
+    window_of = lambda months: sorted(rng.sample(months, 2)) if len(months) > 1 else months * 2  # noqa: E731
+    templates = []
+    for name, info in tables.items():
+        cols = info["columns"]
+        months = month_list(*info["months"]) if info.get("months") and all(info["months"]) else []
+        if name.startswith("top_entities_"):
+            order = "-total_trade" if "total_trade" in cols else ""
+            templates.append(lambda name=name, order=order: f"/query/{name}?order={order}&limit={rng.choice((10, 20, 50, 100))}")
+            continue
+        if not months:
+            continue
+        group = next((c for c in ("Country", "HTS_Number", "hs6", "chapter") if c in cols), None)
+
+        def top_n(name=name, group=group, months=months):
+            a, b = window_of(months)
+            prefix = f"&prefix={rng.choice(chapters)}" if group in ("HTS_Number", "hs6") and chapters else ""
+            return f"/query/{name}?group={group}&from={a}&to={b}{prefix}&order=-trade_value&limit={rng.choice((10, 20, 50))}"
+
+        def subset(name=name, months=months):
+            picked = ",".join(rng.sample(chapters, min(len(chapters), rng.randint(1, 5))))
+            a, b = window_of(months)
+            return f"/query/{name}?chapter={picked}&from={a}&to={b}&columns=chapter,date,trade_value,tariff_paid"
+
+        templates.append(top_n)
+        if "chapter" in cols and chapters and "tariff_paid" in cols:
+            templates.append(subset)
+    if not templates:
+        raise SystemExit("The service has no tables to query")
+    pool = set()
+    for _ in range(50 * n):
+        pool.add(rng.choice(templates)())
+        if len(pool) >= n:
+            break
+    return sorted(pool)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+async def loadtest(args):
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or DEFAULT_PORT
+    probe = Connection(host, port)
+    try:
+        _, _, body = await probe.get("/tables")
+        tables = json.loads(body)
+        chapters = []
+        if "monthly_by_chapter" in tables:
+            _, _, body = await probe.get("/query/monthly_by_chapter?columns=chapter&group=chapter")
+            chapters = [str(c).zfill(2) for c in json.loads(body)["columns"]["chapter"]]  # integer chapters too
+        _, _, before = await probe.get("/stats")
+    except OSError as e:
+        raise SystemExit(f"Cannot reach the service at {args.url} ({e}); start it with: python query_service.py serve")
+
+    rng = random.Random(args.seed)
+    queries = query_mix(tables, chapters, args.distinct, rng)
+    weights = [1 / (rank + 1) for rank in range(len(queries))]  # Zipf: a few hot slices, a long tail
+    targets = rng.choices(queries, weights=weights, k=args.requests)
+    latencies = {"hit": [], "miss": []}
+    failures = []
+    next_request = iter(targets)
+
+    async def client():
+        conn = Connection(host, port)
+        for target in next_request:
+            start = time.perf_counter()
+            try:
+                status, headers, body = await conn.get(target)
+            except (OSError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+                failures.append(f"{target}: {e}")
+                await conn.close()
+                continue
+            elapsed = 1000 * (time.perf_counter() - start)
+            if status != 200:
+                failures.append(f"{target}: {status} {body[:200].decode(errors='replace')}")
+            else:
+                latencies[headers.get("x-cache", "miss")].append(elapsed)
+        await conn.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    wall = time.perf_counter() - start
+    _, _, after = await probe.get("/stats")
+    await probe.close()
+
+    done = len(latencies["hit"]) + len(latencies["miss"])
+    print(f"{done:,} requests ({len(queries)} distinct, Zipf-weighted) over {args.concurrency} connections "
+          f"in {wall:.2f}s: {done / wall:,.0f} req/s, {len(failures)} errors")
+    print(f"  {'':<6}{'n':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}   (ms)")
+    for label, values in (("all", latencies["hit"] + latencies["miss"]), ("hit", latencies["hit"]), ("miss", latencies["miss"])):
+        if not values:
+            continue
+        values.sort()
+        print(f"  {label:<6}{len(values):>8,}" + "".join(f"{percentile(values, p):>9.2f}" for p in (50, 90, 99, 100)))
+    before, after = json.loads(before)["cache"], json.loads(after)["cache"]
+    print(f"  server cache: {after['entries']} entries, {after['bytes'] / 1024 ** 2:.1f} of {after['max_bytes'] / 1024 ** 2:.0f} MB, "
+          f"{after['hits'] - before['hits']:,} hits / {after['misses'] - before['misses']:,} misses, "
+          f"{after['evictions'] - before['evictions']:,} evictions during the run")
+    for failure in failures[:5]:
+        print(f"  ❌ {failure}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve on-demand slices of the processed aggregates, or load-test the service.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    s = sub.add_parser("serve", help="run the query service")
+    s.add_argument("--host", default="127.0.0.1")
+    s.add_argument("--port", type=int, default=DEFAULT_PORT)
+    s.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR, help="directory holding the monthly_by_*/top_entities_* files")
+    s.add_argument("--cache-mb", type=float, default=128, help="result cache size; 0 disables caching")
+    s.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1), help="threads scanning Parquet")
+    t = sub.add_parser("loadtest", help="replay a query mix against a running service and report latency")
+    t.add_argument("--url", default=f"http://127.0.0.1:{DEFAULT_PORT}")
+    t.add_argument("--requests", type=int, default=5000)
+    t.add_argument("--concurrency", type=int, default=32, help="concurrent keep-alive connections")
+    t.add_argument("--distinct", type=int, default=200, help="distinct queries in the mix")
+    t.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    try:
+        asyncio.run(serve(args) if args.command == "serve" else loadtest(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
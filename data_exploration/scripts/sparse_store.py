@@ -0,0 +1,195 @@
+"""
+Query API for the sparse country x HS10 x month store (written by sparse_store.R)
+
+The store keeps every nonzero (country, HS10, month) cell of trade value and
+duties twice: CSR by country and CSC by HS10 code, memory-mapped here. A
+country's row or a code's column is one contiguous run of entries, and so is
+any HS6 or chapter, because codes are sorted. Slices and top-k lists
+therefore read only the entries they return.
+
+    store = SparseStore()                                    # data/processed/sparse_store
+    store.top_products("Vietnam", start="2025-07", k=20)     # after the deal
+    store.top_countries("854140", k=10)                      # who supplies this HS6
+    store.country_slice("Mexico", prefix="87")               # every chapter-87 cell from Mexico
+    store.series("China", "8471300100")                      # one cell's monthly history
+
+Months are "YYYY-MM" strings; start and end are inclusive and default to the
+whole range. Top-k rows are plain dicts (code or country, value_total,
+duties_total, tariff_rate, n_cells), ready to serialise.
+
+Usage:
+    python sparse_store.py top-products Vietnam [--from 2025-07] [--to 2025-08] [--prefix 85] [-k 20]
+    python sparse_store.py top-countries 854140 [--from ...] [--to ...] [-k 10]
+"""
+import argparse
+import json
+import mmap
+import time
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPT_DIR.parents[1]
+DEFAULT_STORE = REPO_ROOT / "data" / "processed" / "sparse_store"
+STORE_VERSION = 1  # SPARSE_STORE_VERSION in sparse_store.R
+METRICS = ("value_total", "duties_total")
+
+
+class SparseStore:
+    def __init__(self, path=DEFAULT_STORE):
+        self.path = Path(path)
+        manifest = json.loads((self.path / "store.json").read_text(encoding="utf-8"))
+        if manifest["version"] != STORE_VERSION:
+            raise ValueError(f"{self.path} is store version {manifest['version']}, this reader expects {STORE_VERSION}; "
+                             "rerun 01_prepare_interactive_data.R")
+        self.countries, self.codes, self.months = manifest["countries"], manifest["hs10"], manifest["months"]
+        self.nnz = manifest["nnz"]
+        self.country_ids = {name: i for i, name in enumerate(self.countries)}
+        self.by_country = self._open(manifest["by_country"])
+        self.by_hs10 = self._open(manifest["by_hs10"])
+
+    def _open(self, spec):
+        with open(self.path / spec["file"], "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return {name: np.frombuffer(buf, dtype=a["dtype"], count=a["length"], offset=a["offset"])
+                for name, a in spec.items() if name != "file"}
+
+    # ------------------------------------------------------------------
+    # Dictionary lookups
+    # ------------------------------------------------------------------
+
+    def month_range(self, start=None, end=None):
+        """Month ids [a, b) covering start..end inclusive."""
+        a = bisect_left(self.months, start[:7]) if start else 0
+        b = bisect_right(self.months, end[:7]) if end else len(self.months)
+        return a, b
+
+    def code_range(self, prefix):
+        """HS10 ids [lo, hi) of every code starting with prefix (an HS10, HS6, chapter...)."""
+        return bisect_left(self.codes, prefix), bisect_left(self.codes, prefix + "\x7f")
+
+    def country_id(self, country):
+        if country not in self.country_ids:
+            raise KeyError(f"Unknown country: {country!r}")
+        return self.country_ids[country]
+
+    # ------------------------------------------------------------------
+    # Slices
+    # ------------------------------------------------------------------
+
+    def _entries(self, csr, start, stop, minor_lo=None, minor_hi=None):
+        """Entries [start, stop) of one orientation, narrowed to minor ids [minor_lo, minor_hi)."""
+        n_months = len(self.months)
+        index = csr["index"][start:stop]
+        if minor_lo is not None:
+            first, last = np.searchsorted(index, [minor_lo * n_months, minor_hi * n_months])
+            start, stop, index = start + first, start + last, index[first:last]
+        minor, month = np.divmod(index, n_months)
+        return {"minor": minor, "month": month, **{m: csr[m][start:stop] for m in METRICS}}
+
+    def _in_months(self, cells, start, end):
+        a, b = self.month_range(start, end)
+        if a == 0 and b == len(self.months):
+            return cells
+        keep = (cells["month"] >= a) & (cells["month"] < b)
+        return {k: v[keep] for k, v in cells.items()}
+
+    def country_slice(self, country, start=None, end=None, prefix=None):
+        """Every cell a country traded: arrays hs10 (ids into .codes), month (ids into .months), value_total, duties_total."""
+        r = self.country_id(country)
+        indptr = self.by_country["indptr"]
+        lo, hi = self.code_range(prefix) if prefix else (None, None)
+        cells = self._entries(self.by_country, indptr[r], indptr[r + 1], lo, hi)
+        cells["hs10"] = cells.pop("minor")
+        return self._in_months(cells, start, end)
+
+    def product_slice(self, prefix, start=None, end=None):
+        """Every cell of the codes under prefix: arrays hs10, country (ids into .countries), month, value_total, duties_total.
+
+        For one country within a prefix, country_slice(country, prefix=...) reads fewer entries.
+        """
+        lo, hi = self.code_range(prefix)
+        indptr = self.by_hs10["indptr"]
+        cells = self._entries(self.by_hs10, indptr[lo], indptr[hi])
+        cells["country"] = cells.pop("minor")
+        cells["hs10"] = np.repeat(np.arange(lo, hi, dtype=np.int32), np.diff(indptr[lo:hi + 1]))
+        return self._in_months(cells, start, end)
+
+    def series(self, country, code):
+        """One (country, HS10) cell per month of the store, zero where there was no trade."""
+        lo, hi = self.code_range(code)
+        if hi - lo != 1 or self.codes[lo] != code:
+            raise KeyError(f"Unknown HS10 code: {code!r}")
+        cells = self.country_slice(country, prefix=code)
+        out = {m: np.zeros(len(self.months)) for m in METRICS}
+        for m in METRICS:
+            out[m][cells["month"]] = cells[m]
+        return {"months": self.months, **{m: out[m].tolist() for m in METRICS}}
+
+    # ------------------------------------------------------------------
+    # Top-k
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _top(ids, cells, labels, key, k, by):
+        """Sum cells per id and return the k largest by `by`, as rows."""
+        n = len(labels)
+        totals = {m: np.bincount(ids, weights=cells[m], minlength=n) for m in METRICS}
+        cells_per_id = np.bincount(ids, minlength=n)
+        candidates = np.flatnonzero(cells_per_id)
+        ranked = totals[by][candidates]
+        if k and len(candidates) > k:
+            keep = np.argpartition(-ranked, k - 1)[:k]
+            candidates, ranked = candidates[keep], ranked[keep]
+        order = candidates[np.argsort(-ranked, kind="stable")]
+        return [{key: labels[i], "value_total": float(totals["value_total"][i]), "duties_total": float(totals["duties_total"][i]),
+                 "tariff_rate": float(totals["duties_total"][i] / totals["value_total"][i]) if totals["value_total"][i] > 0 else None,
+                 "n_cells": int(cells_per_id[i])} for i in order]
+
+    def top_products(self, country, k=10, start=None, end=None, prefix=None, by="value_total"):
+        """The k HS10 codes a country traded most of (by value_total or duties_total) in the month range."""
+        cells = self.country_slice(country, start, end, prefix)
+        return self._top(cells["hs10"], cells, self.codes, "hs10", k, by)
+
+    def top_countries(self, prefix, k=10, start=None, end=None, by="value_total"):
+        """The k countries supplying the most of the codes under prefix in the month range."""
+        cells = self.product_slice(prefix, start, end)
+        return self._top(cells["country"], cells, self.countries, "country", k, by)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Query the sparse country x HS10 x month store.")
+    parser.add_argument("query", choices=("top-products", "top-countries"))
+    parser.add_argument("key", help="country name for top-products, HS code or prefix for top-countries")
+    parser.add_argument("--store", type=Path, default=DEFAULT_STORE, help="store directory written by the prep step")
+    parser.add_argument("--from", dest="start", help="first month, YYYY-MM")
+    parser.add_argument("--to", dest="end", help="last month, YYYY-MM")
+    parser.add_argument("--prefix", help="top-products only: restrict to codes under this HS prefix")
+    parser.add_argument("--by", choices=METRICS, default="value_total", help="ranking metric")
+    parser.add_argument("-k", type=int, default=10, help="rows to return")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    store = SparseStore(args.store)
+    start = time.perf_counter()
+    if args.query == "top-products":
+        rows = store.top_products(args.key, args.k, args.start, args.end, args.prefix, args.by)
+    else:
+        rows = store.top_countries(args.key, args.k, args.start, args.end, args.by)
+    elapsed = time.perf_counter() - start
+    a, b = store.month_range(args.start, args.end)
+    print(f"{args.query} {args.key}, {store.months[a] if a < b else '-'} to {store.months[b - 1] if a < b else '-'}:")
+    for rank, row in enumerate(rows, 1):
+        rate = "n/a" if row["tariff_rate"] is None else f"{100 * row['tariff_rate']:.1f}%"
+        label = row.get("hs10") or row.get("country")
+        print(f"  {rank:>3}. {label:<30} ${row['value_total'] / 1e6:>12,.1f}M  duties ${row['duties_total'] / 1e6:>9,.1f}M"
+              f"  rate {rate:>6}  {row['n_cells']} cells")
+    print(f"{len(rows)} rows in {1000 * elapsed:.2f} ms ({store.nnz:,} cells in the store)")
+
+
+if __name__ == "__main__":
+    main()